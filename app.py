@@ -1,11 +1,17 @@
 import os
 import json
 import sqlite3
-import frontmatter  # Requiere: pip install python-frontmatter
-import markdown     # Requiere: pip install markdown
+import threading
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, g, abort, has_request_context
 from werkzeug.utils import secure_filename
+from mesas import RegistroMesas, MESA_POR_DEFECTO, mesa_valida
+from paquetes import paquetes_de, firma_paquetes, leer_de_paquetes
+import compresion
+import metricas
+import facetas
+import instantaneas
+import escenas
 
 # ========== CONFIGURACIÓN ==========
 app = Flask(__name__)
@@ -18,21 +24,24 @@ MONSTERS_DIR = 'monsters'
 SPELLS_DIR = 'spells'
 RULES_DIR = 'rules'
 
-# Crear carpetas necesarias
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'images'), exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'videos'), exist_ok=True)
-os.makedirs(MONSTERS_DIR, exist_ok=True) 
-os.makedirs(SPELLS_DIR, exist_ok=True)
-os.makedirs(RULES_DIR, exist_ok=True)
+# Tipo de contenido (como en /content/<ctype>/<slug>) -> directorio
+TIPOS_CONTENIDO = {'monster': MONSTERS_DIR, 'spell': SPELLS_DIR, 'rule': RULES_DIR}
 
-# Inicializar archivos JSON de estado
-if not os.path.exists('screen_command.json'):
-    with open('screen_command.json', 'w') as f:
-        json.dump({'type': 'initiative', 'data': None, 'timestamp': datetime.now().isoformat()}, f)
+# Paquetes .zip que se montan además de los .zip dentro de cada directorio.
+# Son los que generan descargar_conjuros.py y generar_reglas.py.
+PAQUETES_EXTRA = {
+    SPELLS_DIR: ['conjuros_srd5_2_es.zip'],
+    RULES_DIR: ['reglas_srd_es.zip'],
+}
 
-if not os.path.exists('whiteboard_state.json'):
-    with open('whiteboard_state.json', 'w') as f:
-        json.dump({'state': None, 'timestamp': datetime.now().isoformat()}, f)
+# Métricas por ruta en /metrics (antes que la compresión para medirla también)
+metricas.registrar(app)
+
+# Compresión gzip/brotli de respuestas y estáticos precomprimidos (precomprimir.py)
+compresion.registrar(app)
+
+# Mesas (partidas) en memoria. Las que llevan 30 min sin polling se descargan.
+mesas = RegistroMesas(inactividad=30 * 60)
 
 # ========== BASE DE DATOS ==========
 def init_db():
@@ -47,98 +56,223 @@ def init_db():
                   type TEXT DEFAULT 'player',
                   is_active INTEGER DEFAULT 1,
                   monster_slug TEXT,
+                  mesa TEXT NOT NULL DEFAULT 'principal',
                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
     
     c.execute('''CREATE TABLE IF NOT EXISTS game_state
                  (id INTEGER PRIMARY KEY,
                   current_turn INTEGER DEFAULT 0,
                   round_number INTEGER DEFAULT 1,
+                  mesa TEXT,
                   last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+    # Migración de BDs anteriores a las mesas: todo pasa a la mesa principal
+    if 'mesa' not in {col[1] for col in c.execute('PRAGMA table_info(characters)')}:
+        c.execute("ALTER TABLE characters ADD COLUMN mesa TEXT NOT NULL DEFAULT 'principal'")
+    if 'mesa' not in {col[1] for col in c.execute('PRAGMA table_info(game_state)')}:
+        c.execute('ALTER TABLE game_state ADD COLUMN mesa TEXT')
     
     c.execute('INSERT OR IGNORE INTO game_state (id) VALUES (1)')
+    c.execute('UPDATE game_state SET mesa = ? WHERE id = 1 AND mesa IS NULL', (MESA_POR_DEFECTO,))
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_game_state_mesa ON game_state (mesa)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_characters_mesa ON characters (mesa, is_active)')
     conn.commit()
     conn.close()
 
-init_db()
+# ========== ARRANQUE DIFERIDO ==========
+# frontmatter y markdown se importan en el primer uso y la inicialización
+# (carpetas, JSON de estado y BD) se hace una sola vez en la primera petición,
+# así el servidor arranca rápido en el mini-PC de la tele.
+_init_lock = threading.Lock()
+_inicializado = False
+
+def inicializar():
+    """Crea carpetas, archivos de estado y tablas. Idempotente."""
+    global _inicializado
+    if _inicializado:
+        return
+    with _init_lock:
+        if _inicializado:
+            return
+        # Crear carpetas necesarias
+        os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'images'), exist_ok=True)
+        os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'videos'), exist_ok=True)
+        os.makedirs(MONSTERS_DIR, exist_ok=True)
+        os.makedirs(SPELLS_DIR, exist_ok=True)
+        os.makedirs(RULES_DIR, exist_ok=True)
+
+        # Inicializar archivos JSON de estado
+        if not os.path.exists('screen_command.json'):
+            with open('screen_command.json', 'w') as f:
+                json.dump({'type': 'initiative', 'data': None, 'timestamp': datetime.now().isoformat()}, f)
+
+        if not os.path.exists('whiteboard_state.json'):
+            with open('whiteboard_state.json', 'w') as f:
+                json.dump({'state': None, 'timestamp': datetime.now().isoformat()}, f)
+
+        init_db()
+        _inicializado = True
+    calentar_grimorio()
+
+@app.before_request
+def _asegurar_inicializado():
+    inicializar()
+
+# ========== MESAS ==========
+# Todas las rutas existen también bajo /t/<mesa>/..., p.ej. /t/sabado/master.
+# Sin prefijo se usa la mesa principal.
+@app.url_value_preprocessor
+def _extraer_mesa(endpoint, values):
+    mesa = values.pop('mesa', None) if values else None
+    if mesa is not None and not mesa_valida(mesa):
+        abort(404)
+    g.mesa = mesa or MESA_POR_DEFECTO
+    g.mesa_base = f'/t/{mesa}' if mesa else ''
+
+@app.context_processor
+def _inyectar_mesa():
+    return {'mesa': g.get('mesa', MESA_POR_DEFECTO), 'mesa_base': g.get('mesa_base', '')}
+
+def mesa_actual():
+    if has_request_context():
+        return g.get('mesa', MESA_POR_DEFECTO)
+    return MESA_POR_DEFECTO
 
 # ========== FUNCIONES DE AYUDA (DB) ==========
 def get_db():
-    conn = sqlite3.connect('rpg.db')
+    conn = sqlite3.connect('rpg.db', factory=metricas.ConexionMedida)
     conn.row_factory = sqlite3.Row 
     return conn
 
-def get_characters():
+def get_characters(mesa=None):
     conn = get_db()
     c = conn.cursor()
-    c.execute('SELECT * FROM characters WHERE is_active = 1 ORDER BY initiative DESC, name') 
+    c.execute('SELECT * FROM characters WHERE is_active = 1 AND mesa = ? ORDER BY initiative DESC, name',
+              (mesa or mesa_actual(),))
     characters = c.fetchall()
     conn.close()
     return characters
 
-def get_game_state():
+def get_game_state(mesa=None):
+    mesa = mesa or mesa_actual()
     conn = get_db()
     c = conn.cursor()
-    c.execute('SELECT * FROM game_state WHERE id = 1')
+    c.execute('SELECT * FROM game_state WHERE mesa = ?', (mesa,))
     state = c.fetchone()
+    if state is None:
+        # Primera vez que se usa esta mesa
+        c.execute('INSERT OR IGNORE INTO game_state (mesa) VALUES (?)', (mesa,))
+        conn.commit()
+        c.execute('SELECT * FROM game_state WHERE mesa = ?', (mesa,))
+        state = c.fetchone()
     conn.close()
     return state
 
-def save_screen_command(command_type, data=None):
-    command = {
-        'type': command_type,
-        'data': data,
-        'timestamp': datetime.now().isoformat()
-    }
-    with open('screen_command.json', 'w') as f:
-        json.dump(command, f)
-    return command
-
-def save_whiteboard_state_file(state_data):
-    state = {
-        'state': state_data,
-        'timestamp': datetime.now().isoformat()
-    }
-    with open('whiteboard_state.json', 'w') as f:
-        json.dump(state, f)
-    return state
+def save_screen_command(command_type, data=None, mesa=None):
+    return mesas.obtener(mesa or mesa_actual()).guardar_comando(command_type, data)
+
+def save_whiteboard_state_file(state_data, mesa=None):
+    return mesas.obtener(mesa or mesa_actual()).guardar_pizarra(state_data)
 
 # ========== LÓGICA DE CONTENIDO (GENÉRICA) ==========
+def _metadatos_item(post, slug):
+    item_data = post.metadata
+    item_data['slug'] = slug
+
+    # Asegurar campo nombre/título
+    if 'nombre' not in item_data and 'title' in item_data:
+        item_data['nombre'] = item_data['title']
+    if 'nombre' not in item_data:
+        item_data['nombre'] = item_data['slug']
+    return item_data
+
 def cargar_contenido_markdown(directorio):
-    """Carga archivos .md de un directorio y devuelve lista de metadatos."""
+    """Carga archivos .md de un directorio (y sus paquetes .zip) y devuelve lista de metadatos."""
+    import frontmatter  # Requiere: pip install python-frontmatter
     lista_items = []
-    if not os.path.exists(directorio):
-        return lista_items
-
-    for filename in os.listdir(directorio):
-        if filename.endswith('.md'):
-            filepath = os.path.join(directorio, filename)
+    vistos = set()
+
+    if os.path.exists(directorio):
+        for filename in os.listdir(directorio):
+            if filename.endswith('.md'):
+                filepath = os.path.join(directorio, filename)
+                try:
+                    with metricas.cronometro('frontmatter_parse'), open(filepath, 'r', encoding='utf-8') as f:
+                        post = frontmatter.load(f)
+                    lista_items.append(_metadatos_item(post, filename[:-3]))
+                    vistos.add(filename[:-3])
+                except Exception as e:
+                    print(f"Error leyendo {filename} en {directorio}: {e}")
+
+    # Los .md sueltos tapan a los del paquete con el mismo slug
+    for paquete in paquetes_de(directorio, PAQUETES_EXTRA.get(directorio, ())):
+        for slug in paquete.slugs():
+            if slug in vistos:
+                continue
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    post = frontmatter.load(f)
-                item_data = post.metadata
-                item_data['slug'] = filename.replace('.md', '') 
-                
-                # Asegurar campo nombre/título
-                if 'nombre' not in item_data and 'title' in item_data:
-                    item_data['nombre'] = item_data['title']
-                if 'nombre' not in item_data:
-                    item_data['nombre'] = item_data['slug']
-                    
-                lista_items.append(item_data)
+                texto = paquete.leer(slug)
+                with metricas.cronometro('frontmatter_parse'):
+                    post = frontmatter.loads(texto)
+                lista_items.append(_metadatos_item(post, slug))
+                vistos.add(slug)
             except Exception as e:
-                print(f"Error leyendo {filename} en {directorio}: {e}")
+                print(f"Error leyendo {slug}.md en {paquete.nombre}: {e}")
     
     return sorted(lista_items, key=lambda x: x.get('nombre', '').lower())
 
+# Índice del grimorio en memoria: directorio -> (firma, lista de metadatos).
+# La firma son los nombres y mtimes de los .md y de los paquetes, así solo se
+# vuelve a parsear cuando alguien añade, borra o edita un archivo.
+_indice_grimorio = {}
+_indice_lock = threading.Lock()
+
+def _firma_directorio(directorio):
+    paquetes = firma_paquetes(directorio, PAQUETES_EXTRA.get(directorio, ()))
+    if not os.path.exists(directorio):
+        return (), paquetes
+    with os.scandir(directorio) as it:
+        return tuple(sorted((e.name, e.stat().st_mtime_ns) for e in it if e.name.endswith('.md'))), paquetes
+
+def indice_grimorio(directorio):
+    """Como cargar_contenido_markdown pero cacheado hasta que cambie el directorio."""
+    firma = _firma_directorio(directorio)
+    cacheado = _indice_grimorio.get(directorio)
+    if cacheado and cacheado[0] == firma:
+        return cacheado[1]
+    with _indice_lock:
+        cacheado = _indice_grimorio.get(directorio)
+        if cacheado and cacheado[0] == firma:
+            return cacheado[1]
+        lista = cargar_contenido_markdown(directorio)
+        _indice_grimorio[directorio] = (firma, lista)
+        return lista
+
+def calentar_grimorio():
+    """Precarga el índice de los tres grimorios en un hilo de fondo."""
+    def _calentar():
+        for directorio in (MONSTERS_DIR, SPELLS_DIR, RULES_DIR):
+            indice_grimorio(directorio)
+    hilo = threading.Thread(target=_calentar, name='calentar-grimorio', daemon=True)
+    hilo.start()
+    return hilo
+
 def get_markdown_detail(directorio, slug):
     """Obtiene el contenido HTML y metadatos de un slug específico."""
     filepath = os.path.join(directorio, f'{slug}.md')
-    if not os.path.exists(filepath):
-        return None, None
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            post = frontmatter.load(f)
-        contenido_html = markdown.markdown(post.content, extensions=['tables'])
+        import frontmatter  # Requiere: pip install python-frontmatter
+        import markdown     # Requiere: pip install markdown
+        if os.path.exists(filepath):
+            with metricas.cronometro('frontmatter_parse'), open(filepath, 'r', encoding='utf-8') as f:
+                post = frontmatter.load(f)
+        else:
+            texto = leer_de_paquetes(directorio, slug, PAQUETES_EXTRA.get(directorio, ()))
+            if texto is None:
+                return None, None
+            with metricas.cronometro('frontmatter_parse'):
+                post = frontmatter.loads(texto)
+        with metricas.cronometro('markdown_render'):
+            contenido_html = markdown.markdown(post.content, extensions=['tables'])
         return post.metadata, contenido_html
     except Exception:
         return None, None
@@ -153,9 +287,9 @@ def master():
     game_state = get_game_state()
     
     # Cargar los 3 tipos de contenido
-    monsters = cargar_contenido_markdown(MONSTERS_DIR)
-    spells = cargar_contenido_markdown(SPELLS_DIR)
-    rules = cargar_contenido_markdown(RULES_DIR)
+    monsters = indice_grimorio(MONSTERS_DIR)
+    spells = indice_grimorio(SPELLS_DIR)
+    rules = indice_grimorio(RULES_DIR)
     
     return render_template('master.html', 
                            characters=characters_data, 
@@ -173,9 +307,7 @@ def player_screen(): return render_template('player.html', fullscreen=True)
 # Ruta unificada para obtener detalles (AJAX)
 @app.route('/content/<ctype>/<slug>')
 def get_content_detail(ctype, slug):
-    directory = MONSTERS_DIR
-    if ctype == 'spell': directory = SPELLS_DIR
-    elif ctype == 'rule': directory = RULES_DIR
+    directory = TIPOS_CONTENIDO.get(ctype, MONSTERS_DIR)
     
     metadata, html = get_markdown_detail(directory, slug)
     if not metadata:
@@ -185,23 +317,77 @@ def get_content_detail(ctype, slug):
     # Asumimos que existe monstruo_detalle.html, podemos reutilizarlo para todos
     return render_template('monstruo_detalle.html', metadata=metadata, contenido=html, type=ctype)
 
+# ========== API: GRIMORIO (FILTROS Y FACETAS) ==========
+def _indice_facetas(ctype):
+    if ctype not in TIPOS_CONTENIDO:
+        abort(404)
+    return facetas.indice_para(ctype, indice_grimorio(TIPOS_CONTENIDO[ctype]))
+
+@app.route('/api/grimoire/<ctype>', methods=['GET'])
+def api_grimoire_filter(ctype):
+    # p.ej. /api/grimoire/spell?school=Evocación&level=3 o /api/grimoire/monster?cr_max=2
+    indice = _indice_facetas(ctype)
+    slugs = indice.filtrar(request.args)
+    return jsonify({'success': True, 'total': len(slugs), 'items': indice.ordenar(slugs),
+                    'facetas': indice.contar(slugs)})
+
+@app.route('/api/grimoire/<ctype>/facets', methods=['GET'])
+def api_grimoire_facets(ctype):
+    indice = _indice_facetas(ctype)
+    slugs = indice.filtrar(request.args)
+    return jsonify({'success': True, 'total': len(slugs), 'facetas': indice.contar(slugs)})
+
 # ========== API: PIZARRA ==========
 @app.route('/api/whiteboard/save', methods=['POST'])
 def api_save_whiteboard():
     data = request.json
     state_json = data.get('state')
     if not state_json: return jsonify({'success': False}), 400
-    save_whiteboard_state_file(state_json)
-    return jsonify({'success': True})
+    state = save_whiteboard_state_file(state_json)
+    return jsonify({'success': True, 'version': state['version']})
 
 @app.route('/api/whiteboard/load', methods=['GET'])
 def api_load_whiteboard():
-    try:
-        with open('whiteboard_state.json', 'r') as f:
-            state = json.load(f)
-        return jsonify(state)
-    except:
-        return jsonify({'state': None})
+    # Cada pantalla que proyecta la pizarra la pide una vez por segundo: se
+    # comprime solo cuando cambia, no en cada petición
+    estado = mesas.obtener(mesa_actual())
+    pizarra = estado.pizarra
+    return compresion.json_cacheado(estado.cache_pizarra, pizarra['timestamp'], pizarra)
+
+# Historial: cada guardado es una versión; deshacer/rehacer y saltar a
+# cualquier versión sobreviven a recargar la página y al reinicio del servidor
+@app.route('/api/whiteboard/history', methods=['GET'])
+def api_whiteboard_history():
+    return jsonify({'success': True, **mesas.obtener(mesa_actual()).historial.resumen()})
+
+@app.route('/api/whiteboard/history/<int:version>', methods=['GET'])
+def api_whiteboard_history_version(version):
+    resultado = mesas.obtener(mesa_actual()).historial.estado(version)
+    if resultado is None:
+        return jsonify({'success': False, 'error': 'Esa versión ya no está en el historial'}), 404
+    return jsonify({'success': True, 'version': version, 'state': resultado[0],
+                    'timestamp': datetime.fromtimestamp(resultado[1]).isoformat()})
+
+@app.route('/api/whiteboard/history/<int:version>', methods=['POST'])
+def api_whiteboard_goto(version):
+    state = mesas.obtener(mesa_actual()).ir_a_version(version)
+    if state is None:
+        return jsonify({'success': False, 'error': 'Esa versión ya no está en el historial'}), 404
+    return jsonify({'success': True, **state})
+
+@app.route('/api/whiteboard/undo', methods=['POST'])
+def api_whiteboard_undo():
+    state = mesas.obtener(mesa_actual()).deshacer_pizarra()
+    if state is None:
+        return jsonify({'success': False, 'error': 'No hay nada que deshacer'}), 404
+    return jsonify({'success': True, **state})
+
+@app.route('/api/whiteboard/redo', methods=['POST'])
+def api_whiteboard_redo():
+    state = mesas.obtener(mesa_actual()).rehacer_pizarra()
+    if state is None:
+        return jsonify({'success': False, 'error': 'No hay nada que rehacer'}), 404
+    return jsonify({'success': True, **state})
 
 # ========== API: PERSONAJES ==========
 @app.route('/api/characters', methods=['GET'])
@@ -239,10 +425,25 @@ def api_get_characters():
 def api_add_character():
     data = request.json
     if not data.get('name'): return jsonify({'success': False}), 400
+    # Hordas: 'cantidad' copias y, si viene 'hp_roll' sin 'hp', PG tirados para cada una
+    try:
+        cantidad = max(1, min(_entero(data.get('cantidad'), 1), 100))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    hp_list = [data.get('hp')] * cantidad
+    max_hp_list = [data.get('max_hp')] * cantidad
+    if data.get('hp_roll') and data.get('hp') in (None, ''):
+        import dados
+        try:
+            hp_list = max_hp_list = [max(1, int(v)) for v in dados.tirar(data['hp_roll'], cantidad)]
+        except dados.ErrorDados as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    names = [data['name']] if cantidad == 1 else [f"{data['name']} {i + 1}" for i in range(cantidad)]
     conn = get_db()
     c = conn.cursor()
-    c.execute('''INSERT INTO characters (name, initiative, hp, max_hp, type, monster_slug) VALUES (?, ?, ?, ?, ?, ?)''',
-              (data['name'], int(data.get('initiative', 0)), data.get('hp'), data.get('max_hp'), data.get('type', 'player'), data.get('slug')))
+    c.executemany('''INSERT INTO characters (name, initiative, hp, max_hp, type, monster_slug, mesa) VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                  [(name, int(data.get('initiative', 0)), hp, max_hp, data.get('type', 'player'), data.get('slug'), mesa_actual())
+                   for name, hp, max_hp in zip(names, hp_list, max_hp_list)])
     conn.commit()
     conn.close()
     save_screen_command('initiative')
@@ -252,7 +453,7 @@ def api_add_character():
 def api_delete_character(char_id):
     conn = get_db()
     c = conn.cursor()
-    c.execute('UPDATE characters SET is_active = 0 WHERE id = ?', (char_id,))
+    c.execute('UPDATE characters SET is_active = 0 WHERE id = ? AND mesa = ?', (char_id, mesa_actual()))
     conn.commit()
     conn.close()
     save_screen_command('initiative')
@@ -262,7 +463,7 @@ def api_delete_character(char_id):
 def api_update_hp(char_id):
     conn = get_db()
     c = conn.cursor()
-    c.execute('UPDATE characters SET hp = ? WHERE id = ?', (request.json.get('hp'), char_id))
+    c.execute('UPDATE characters SET hp = ? WHERE id = ? AND mesa = ?', (request.json.get('hp'), char_id, mesa_actual()))
     conn.commit()
     conn.close()
     save_screen_command('initiative')
@@ -274,14 +475,14 @@ def api_next_turn():
     conn = get_db()
     c = conn.cursor()
     state = get_game_state()
-    c.execute("SELECT COUNT(*) FROM characters WHERE is_active = 1")
+    c.execute("SELECT COUNT(*) FROM characters WHERE is_active = 1 AND mesa = ?", (mesa_actual(),))
     total = c.fetchone()[0]
     if total == 0: 
         conn.close()
         return jsonify({'success': False})
     new_turn = (state['current_turn'] + 1) % total
     round_number = state['round_number'] + 1 if new_turn == 0 else state['round_number']
-    c.execute('UPDATE game_state SET current_turn = ?, round_number = ?, last_updated = CURRENT_TIMESTAMP WHERE id = 1', (new_turn, round_number))
+    c.execute('UPDATE game_state SET current_turn = ?, round_number = ?, last_updated = CURRENT_TIMESTAMP WHERE mesa = ?', (new_turn, round_number, mesa_actual()))
     conn.commit()
     conn.close()
     save_screen_command('initiative')
@@ -292,14 +493,14 @@ def api_prev_turn():
     conn = get_db()
     c = conn.cursor()
     state = get_game_state()
-    c.execute("SELECT COUNT(*) FROM characters WHERE is_active = 1")
+    c.execute("SELECT COUNT(*) FROM characters WHERE is_active = 1 AND mesa = ?", (mesa_actual(),))
     total = c.fetchone()[0]
     if total == 0: 
         conn.close()
         return jsonify({'success': False})
     new_turn = (state['current_turn'] - 1 + total) % total
     round_number = state['round_number'] - 1 if (state['current_turn'] == 0 and new_turn == (total - 1) and state['round_number'] > 1) else state['round_number']
-    c.execute('UPDATE game_state SET current_turn = ?, round_number = ?, last_updated = CURRENT_TIMESTAMP WHERE id = 1', (new_turn, round_number))
+    c.execute('UPDATE game_state SET current_turn = ?, round_number = ?, last_updated = CURRENT_TIMESTAMP WHERE mesa = ?', (new_turn, round_number, mesa_actual()))
     conn.commit()
     conn.close()
     save_screen_command('initiative')
@@ -307,15 +508,80 @@ def api_prev_turn():
 
 @app.route('/api/game/reset', methods=['POST'])
 def api_reset_game():
+    # Por si acaso: el encuentro que se va a borrar queda en una instantánea.
+    # Si no se puede hacer (disco lleno, permisos...) se avisa y se resetea igual
+    try:
+        instantaneas.crear('rpg.db', mesa_actual(), mesas.obtener(mesa_actual()), prefijo='antes-del-reset',
+                           medios_en_segundo_plano=True)
+    except (OSError, sqlite3.Error, instantaneas.ErrorInstantanea) as e:
+        print(f"⚠️ No se pudo guardar la instantánea antes del reset: {e}")
     conn = get_db()
     c = conn.cursor()
-    c.execute('UPDATE characters SET is_active = 0')
-    c.execute('UPDATE game_state SET current_turn = 0, round_number = 1 WHERE id = 1')
+    c.execute('UPDATE characters SET is_active = 0 WHERE mesa = ?', (mesa_actual(),))
+    c.execute('UPDATE game_state SET current_turn = 0, round_number = 1 WHERE mesa = ?', (mesa_actual(),))
     conn.commit()
     conn.close()
     save_screen_command('clear')
     return jsonify({'success': True})
 
+# ========== API: DADOS ==========
+def _datos_peticion():
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else request.args
+
+def _entero(valor, por_defecto):
+    """Entero de un parámetro de la petición (JSON o query). ValueError si no lo es."""
+    if valor is None or valor == '':
+        return por_defecto
+    if isinstance(valor, bool) or not isinstance(valor, (int, str)):
+        raise ValueError(f'Se esperaba un número entero: {valor!r}')
+    return int(valor)
+
+@app.route('/api/dice/roll', methods=['GET', 'POST'])
+def api_dice_roll():
+    import dados
+    data = _datos_peticion()
+    try:
+        resultados = dados.tirar(data.get('expr', ''), _entero(data.get('n'), 1))
+    except (dados.ErrorDados, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'expr': data.get('expr'), 'rolls': resultados.tolist(),
+                    'total': int(resultados.sum())})
+
+@app.route('/api/dice/stats', methods=['GET', 'POST'])
+def api_dice_stats():
+    import dados
+    data = _datos_peticion()
+    try:
+        stats = dados.compilar(data.get('expr', '')).estadisticas()
+    except dados.ErrorDados as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, **stats})
+
+# ========== API: INSTANTÁNEAS DE SESIÓN ==========
+@app.route('/api/session/snapshot', methods=['POST'])
+def api_session_snapshot():
+    data = _datos_peticion()
+    try:
+        manifiesto = instantaneas.crear('rpg.db', mesa_actual(), mesas.obtener(mesa_actual()), data.get('nombre'))
+    except instantaneas.ErrorInstantanea as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'nombre': manifiesto['nombre'], 'medios': manifiesto['medios'],
+                    'ms': manifiesto['ms']})
+
+@app.route('/api/session/restore', methods=['POST'])
+def api_session_restore():
+    data = _datos_peticion()
+    try:
+        resultado = instantaneas.restaurar('rpg.db', mesa_actual(), mesas.obtener(mesa_actual()), data.get('nombre'))
+    except instantaneas.ErrorInstantanea as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, **resultado})
+
+@app.route('/api/session/snapshots', methods=['GET'])
+def api_session_list():
+    return jsonify({'success': True, 'snapshots': instantaneas.listar(mesa_actual())})
+
 # ========== API: MEDIA Y PANTALLA ==========
 @app.route('/api/media/upload', methods=['POST'])
 def api_upload_media():
@@ -338,7 +604,12 @@ def api_upload_media():
 
     target_folder = os.path.join(app.config['UPLOAD_FOLDER'], folder_name)
     os.makedirs(target_folder, exist_ok=True)
-    file.save(os.path.join(target_folder, filename))
+    target_path = os.path.join(target_folder, filename)
+    # Borramos antes de escribir: las instantáneas guardan los medios con
+    # enlaces duros y sobrescribir en el sitio cambiaría también su copia
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    file.save(target_path)
     
     return jsonify({'success': True, 'url': f'/static/uploads/{folder_name}/{filename}', 'filename': filename})
 
@@ -396,22 +667,125 @@ def api_blackout_screen():
 # RUTA PARA JUGADORES (LECTURA)
 @app.route('/api/screen/command', methods=['GET'])
 def api_get_command():
+    metricas.anotar_pantalla(mesa_actual())
+    estado = mesas.obtener(mesa_actual())
+    # 'escenas' cambia cuando hay que precargar otra cosa; la pantalla pide
+    # entonces el manifiesto, sin hacer una petición más por segundo
+    return jsonify(dict(estado.comando, escenas=estado.escenas['timestamp']))
+
+# ========== API: LISTA DE ESCENAS ==========
+def _resumen_escenas(estado):
+    lista = estado.escenas['escenas']
+    return {'success': True, 'escenas': lista, 'actual': estado.escenas['actual'],
+            'estado': estado.precarga.resumen(lista)}
+
+@app.route('/api/scenes', methods=['GET'])
+def api_scenes():
+    return jsonify(_resumen_escenas(mesas.obtener(mesa_actual())))
+
+@app.route('/api/scenes', methods=['POST'])
+def api_scenes_set():
+    # {"escenas": [...]} sustituye la lista; {"escena": {...}} la añade al final
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Se esperaba un objeto JSON'}), 400
+    estado = mesas.obtener(mesa_actual())
     try:
-        with open('screen_command.json', 'r') as f: return jsonify(json.load(f))
-    except: return jsonify({'type': 'initiative'})
+        if 'escenas' in data:
+            if not isinstance(data['escenas'] or [], list):
+                raise escenas.ErrorEscena("escenas debe ser una lista")
+            lista = [escenas.normalizar(e) for e in data['escenas'] or []]
+        else:
+            lista = estado.escenas['escenas'] + [escenas.normalizar(data.get('escena'))]
+    except escenas.ErrorEscena as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if len(lista) > escenas.MAX_ESCENAS:
+        return jsonify({'success': False, 'error': f'Máximo {escenas.MAX_ESCENAS} escenas'}), 400
+    estado.guardar_escenas(lista)
+    return jsonify(_resumen_escenas(estado))
+
+@app.route('/api/scenes/<int:indice>', methods=['DELETE'])
+def api_scenes_delete(indice):
+    estado = mesas.obtener(mesa_actual())
+    lista = list(estado.escenas['escenas'])
+    if not 0 <= indice < len(lista):
+        return jsonify({'success': False, 'error': 'No existe esa escena'}), 404
+    del lista[indice]
+    actual = estado.escenas['actual']
+    estado.guardar_escenas(lista, actual - 1 if indice < actual else actual)
+    return jsonify(_resumen_escenas(estado))
+
+@app.route('/api/scenes/go', methods=['POST'])
+def api_scenes_go():
+    # {"indice": N}, o {"paso": 1 / -1} para avanzar o retroceder
+    data = _datos_peticion()
+    estado = mesas.obtener(mesa_actual())
+    lista = estado.escenas['escenas']
+    try:
+        indice = _entero(data.get('indice'), None)
+        if indice is None:
+            indice = estado.escenas['actual'] + _entero(data.get('paso'), 1)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if not 0 <= indice < len(lista):
+        return jsonify({'success': False, 'error': 'No existe esa escena'}), 404
+    escena = lista[indice]
+    estado.guardar_escenas(lista, indice)  # mueve también la ventana de precarga
+    save_screen_command(escena['type'], escena['data'])
+    return jsonify(_resumen_escenas(estado))
+
+@app.route('/api/scenes/manifest', methods=['GET'])
+def api_scenes_manifest():
+    estado = mesas.obtener(mesa_actual())
+    return jsonify({'success': True, 'timestamp': estado.escenas['timestamp'],
+                    'recursos': escenas.manifiesto(estado.escenas['escenas'], estado.escenas['actual'])})
+
+@app.route('/api/scenes/preload-status', methods=['POST'])
+def api_scenes_preload_status():
+    # Cada pantalla informa de qué URLs tiene ya descargadas y decodificadas
+    data = _datos_peticion()
+    listas, fallidas = data.get('listas') or [], data.get('fallidas') or []
+    if not isinstance(listas, list) or not isinstance(fallidas, list) \
+            or not all(isinstance(u, str) for u in listas + fallidas):
+        return jsonify({'success': False, 'error': 'listas y fallidas deben ser listas de URLs'}), 400
+    pantalla = str(data.get('pantalla') or request.remote_addr)[:64]
+    mesas.obtener(mesa_actual()).precarga.anotar(pantalla, listas, fallidas)
+    return jsonify({'success': True})
 
 @app.route('/static/uploads/<path:filename>')
 def serve_uploads(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 # ... (Resto del código igual) ...
 
+# ========== MÉTRICAS ==========
+@app.route('/metrics', methods=['GET'])
+def api_metrics():
+    return metricas.exportar(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/api/metrics/profiler', methods=['GET', 'POST'])
+def api_metrics_profiler():
+    # POST {"activo": true/false} enciende o apaga; GET devuelve las pilas más vistas
+    if request.method == 'POST':
+        if request.json.get('activo'):
+            metricas.perfilador.iniciar()
+        else:
+            metricas.perfilador.detener()
+        return jsonify({'success': True, 'activo': metricas.perfilador.activo})
+    return metricas.perfilador.informe(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+@app.route('/api/compression/stats', methods=['GET'])
+def api_compression_stats():
+    return jsonify({'success': True, 'endpoints': compresion.estadisticas()})
+
 # NUEVO: Endpoint para renderizar Markdown crudo a HTML bajo demanda
 @app.route('/api/render-markdown-text', methods=['POST'])
 def api_render_markdown_text():
     data = request.json
     text = data.get('text', '')
+    import markdown
     # Usamos las mismas extensiones que en el resto de la app
-    html_content = markdown.markdown(text, extensions=['tables'])
+    with metricas.cronometro('markdown_render'):
+        html_content = markdown.markdown(text, extensions=['tables'])
     return jsonify({'success': True, 'html': html_content})
 
 @app.route('/api/screen/toggle-grid', methods=['POST'])
@@ -435,12 +809,15 @@ def list_audios():
         return jsonify(files)
     except: return jsonify([])
 
+# Duplicamos cada ruta bajo /t/<mesa> (excepto los estáticos, que son comunes)
+for _regla in list(app.url_map.iter_rules()):
+    if _regla.endpoint not in ('static', 'serve_uploads'):
+        app.add_url_rule('/t/<mesa>' + _regla.rule, endpoint=_regla.endpoint, methods=_regla.methods)
+
 if __name__ == '__main__':
-    # Usamos rpg.db como indicaste
-    if not os.path.exists('rpg.db'):
-        conn = sqlite3.connect('rpg.db')
-        conn.execute('CREATE TABLE characters (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, initiative INTEGER, hp INTEGER, max_hp INTEGER, type TEXT, portrait_path TEXT)')
-        conn.close()
+    # Usamos rpg.db como indicaste. Inicializamos antes de abrir el puerto
+    # para que la primera petición no pague la creación de tablas.
+    inicializar()
     
     print("🚀 Servidor RPG Master iniciado en http://127.0.0.1:5000")
     app.run(debug=True, port=5000)
\ No newline at end of file
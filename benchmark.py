@@ -0,0 +1,335 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ========== BENCHMARK: UNA MESA EN DIRECTO ==========
+# Simula una partida contra la app Flask (en proceso o en localhost):
+#   - N pantallas de jugador haciendo polling de /api/screen/command y
+#     /api/characters cada segundo,
+#   - el máster haciendo polling cada 3 s,
+#   - un guion de acciones del máster (next-turn, PG, show-image, pizarra...)
+# con grimorios generados de 10, 1.000 y 10.000 .md. Saca p50/p95/p99 y
+# peticiones/s por ruta y compara contra una línea base guardada.
+#
+#   python benchmark.py                      # ejecuta y compara con la base
+#   python benchmark.py --guardar            # ejecuta y guarda como base nueva
+#   python benchmark.py --url http://127.0.0.1:5000   # contra un servidor real,
+#                                                       # en la mesa /t/bench
+#
+# La línea base depende de la máquina: guárdala en el propio mini-PC.
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+RUTA_BASE = os.path.join(DIRECTORIO_APP, 'benchmarks', 'baseline.json')
+TAMANOS = (10, 1000, 10000)
+TOLERANCIA = 1.25  # p95 más de un 25% peor que la base = regresión
+
+ESCUELAS = ['Abjuración', 'Conjuración', 'Adivinación', 'Encantamiento',
+            'Evocación', 'Ilusión', 'Nigromancia', 'Transmutación']
+DESAFIOS = ['0', '1 /8', '1 /4', '1 /2', '1', '2', '3', '5', '8', '13']
+
+# ========== CONTENIDO SINTÉTICO ==========
+def generar_contenido(destino, cantidad, rng):
+    """Reparte `cantidad` .md entre monsters/, spells/ y rules/."""
+    por_tipo = {'monsters': cantidad // 3, 'spells': cantidad // 3}
+    por_tipo['rules'] = cantidad - sum(por_tipo.values())
+    for carpeta, n in por_tipo.items():
+        os.makedirs(os.path.join(destino, carpeta), exist_ok=True)
+        for i in range(n):
+            if carpeta == 'monsters':
+                meta = (f'nombre: "Monstruo {i}"\ntipo: bestia\ntamaño: Mediano\nac: {rng.randint(10, 20)}\n'
+                        f'hp: {rng.randint(5, 150)}\nhp_roll: {rng.randint(1, 20)}d8\n'
+                        f'desafio: {rng.choice(DESAFIOS)}\n')
+            elif carpeta == 'spells':
+                meta = (f'nombre: "Conjuro {i}"\nlevel: "Nivel {rng.randint(1, 9)}"\n'
+                        f'school: "{rng.choice(ESCUELAS)}"\ntiempo: "1 acción"\n')
+            else:
+                meta = f'nombre: "Regla {i}"\ncategory: "Acciones"\n'
+            cuerpo = '\n'.join(f'Línea {j} con **negrita** y un 2d6 de daño.' for j in range(20))
+            with open(os.path.join(destino, carpeta, f'item_{i}.md'), 'w', encoding='utf-8') as f:
+                f.write(f'---\n{meta}---\n\n### Descripción\n{cuerpo}\n| A | B |\n|---|---|\n| 1 | 2 |\n')
+
+def generar_pizarra(objetos, rng):
+    """JSON tipo Fabric.js con `objetos` trazos, como lo manda master.js."""
+    trazos = [{'type': 'path', 'stroke': '#c00', 'strokeWidth': 3,
+               'path': [['M', rng.randint(0, 1900), rng.randint(0, 1000)]] +
+                       [['Q', rng.randint(0, 1900), rng.randint(0, 1000), rng.randint(0, 1900), rng.randint(0, 1000)]
+                        for _ in range(20)]}
+              for _ in range(objetos)]
+    return json.dumps({'version': '5.3.1', 'objects': trazos, 'background': 'white'})
+
+# ========== CLIENTES ==========
+class ClienteEnProceso:
+    def __init__(self):
+        import app
+        self.app = app
+        self._local = threading.local()
+
+    def pedir(self, metodo, url, datos=None):
+        cliente = getattr(self._local, 'cliente', None)
+        if cliente is None:
+            cliente = self._local.cliente = self.app.app.test_client()
+        r = cliente.open(url, method=metodo, json=datos)
+        cuerpo = r.get_data()
+        r.close()
+        return r.status_code, cuerpo
+
+class ClienteHTTP:
+    """Contra un servidor real todo va a una mesa propia (/t/<mesa>), para no
+    tocar los personajes, la pantalla ni la pizarra de la partida de verdad."""
+
+    def __init__(self, base, mesa='bench'):
+        self.base = base.rstrip('/') + f'/t/{mesa}'
+
+    def pedir(self, metodo, url, datos=None):
+        import urllib.request
+        cuerpo = json.dumps(datos).encode() if datos is not None else None
+        req = urllib.request.Request(self.base + url, data=cuerpo, method=metodo,
+                                     headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req) as r:
+            return r.status, r.read()
+
+# ========== GUION DE LA PARTIDA ==========
+def generar_eventos(jugadores, segundos, rng, pizarra):
+    """Lista ordenada de (t, ruta, método, url, datos) para toda la sesión."""
+    eventos = []
+    for j in range(jugadores):
+        desfase = rng.random()
+        for s in range(segundos):
+            t = s + desfase
+            eventos.append((t, 'GET /api/screen/command', 'GET', '/api/screen/command', None))
+            eventos.append((t, 'GET /api/characters', 'GET', '/api/characters', None))
+    for s in range(0, segundos, 3):
+        eventos.append((s + 0.5, 'GET /api/characters (master)', 'GET', '/api/characters', None))
+
+    acciones = [
+        ('POST /api/game/next-turn', 'POST', '/api/game/next-turn', None),
+        ('PUT /api/characters/<id>/hp', 'PUT', '/api/characters/{id}/hp', 'hp'),
+        ('POST /api/screen/show-image', 'POST', '/api/screen/show-image', {'url': '/static/uploads/images/mapa.jpg'}),
+        ('POST /api/whiteboard/save', 'POST', '/api/whiteboard/save', {'state': pizarra}),
+        ('GET /api/whiteboard/load', 'GET', '/api/whiteboard/load', None),
+        ('GET /content/monster/<slug>', 'GET', '/content/monster/item_0', None),
+        ('POST /api/screen/show-initiative', 'POST', '/api/screen/show-initiative', None),
+    ]
+    for i, s in enumerate(range(1, segundos, 2)):
+        ruta, metodo, url, datos = acciones[i % len(acciones)]
+        eventos.append((s + 0.25, ruta, metodo, url, datos))
+    return sorted(eventos, key=lambda e: e[0])
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    k = min(len(ordenados) - 1, max(0, int(round(p / 100 * (len(ordenados) - 1)))))
+    return ordenados[k]
+
+def resumir(latencias, duracion):
+    resumen = {}
+    for ruta, valores in sorted(latencias.items()):
+        v = sorted(valores)
+        resumen[ruta] = {
+            'n': len(v),
+            'p50_ms': round(percentil(v, 50), 3),
+            'p95_ms': round(percentil(v, 95), 3),
+            'p99_ms': round(percentil(v, 99), 3),
+            'rps': round(len(v) / duracion, 1) if duracion else 0.0,
+        }
+    return resumen
+
+def vaciar_mesa(cliente):
+    """Retira los personajes activos de la mesa. Sin /api/game/reset, que
+    además haría una instantánea en cada pasada."""
+    _, cuerpo = cliente.pedir('GET', '/api/characters')
+    for personaje in json.loads(cuerpo)['characters']:
+        cliente.pedir('DELETE', f"/api/characters/{personaje['id']}")
+
+def simular_mesa(cliente, jugadores, segundos, tiempo_real, rng):
+    """Ejecuta la sesión y devuelve latencias (ms) por ruta."""
+    # Empezamos siempre con la mesa vacía: si se acumulan PJ de pasadas
+    # anteriores, cada ejecución mide una mesa más grande que la base
+    vaciar_mesa(cliente)
+    try:
+        return _jugar(cliente, jugadores, segundos, tiempo_real, rng)
+    finally:
+        vaciar_mesa(cliente)
+
+def _jugar(cliente, jugadores, segundos, tiempo_real, rng):
+    # Preparamos la mesa: unos cuantos PJ y una horda
+    for nombre, ini in (('Aria', 18), ('Borin', 12), ('Cael', 9), ('Dara', 15)):
+        cliente.pedir('POST', '/api/characters', {'name': nombre, 'initiative': ini, 'hp': 30, 'max_hp': 30})
+    cliente.pedir('POST', '/api/characters', {'name': 'Goblin', 'initiative': 14, 'hp': 7, 'max_hp': 7,
+                                              'type': 'monster', 'slug': 'item_0', 'cantidad': 4})
+    _, cuerpo = cliente.pedir('GET', '/api/characters')
+    ids = [c['id'] for c in json.loads(cuerpo)['characters']] or [0]
+
+    eventos = generar_eventos(jugadores, segundos, rng, generar_pizarra(300, rng))
+    latencias = {}
+    lock = threading.Lock()
+    errores = []
+
+    def lanzar(evento):
+        _, ruta, metodo, url, datos = evento
+        if datos == 'hp':
+            url, datos = url.format(id=rng.choice(ids)), {'hp': rng.randint(0, 30)}
+        inicio = time.perf_counter()
+        try:
+            estado, _ = cliente.pedir(metodo, url, datos)
+            if estado >= 400:
+                errores.append(f'{ruta}: HTTP {estado}')
+        except Exception as e:
+            errores.append(f'{ruta}: {e}')
+        ms = (time.perf_counter() - inicio) * 1000
+        with lock:
+            latencias.setdefault(ruta, []).append(ms)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jugadores + 2) as pool:
+        for evento in eventos:
+            if tiempo_real:
+                espera = evento[0] - (time.perf_counter() - inicio)
+                if espera > 0:
+                    time.sleep(espera)
+            pool.submit(lanzar, evento)
+    duracion = time.perf_counter() - inicio
+    return latencias, duracion, errores
+
+# ========== MICROBENCHMARKS ==========
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+def microbenchmarks(app, rng, repeticiones=5):
+    """Funciones internas sin caché, para que no escondan regresiones."""
+    pizarra = generar_pizarra(300, rng)
+    with app.app.test_request_context('/'):
+        return {
+            'cargar_contenido_markdown(monsters)': medir(lambda: app.cargar_contenido_markdown(app.MONSTERS_DIR), repeticiones),
+            'cargar_contenido_markdown(spells)': medir(lambda: app.cargar_contenido_markdown(app.SPELLS_DIR), repeticiones),
+            'api_get_characters': medir(lambda: app.api_get_characters(), repeticiones * 20),
+            'save_screen_command': medir(lambda: app.save_screen_command('initiative'), repeticiones * 20),
+            'save_whiteboard_state_file': medir(lambda: app.save_whiteboard_state_file(pizarra), repeticiones * 4),
+        }
+
+# ========== EJECUCIÓN ==========
+def ejecutar_tamano(tamano, jugadores, segundos, tiempo_real, semilla):
+    """Corre un tamaño de grimorio en un directorio temporal (proceso hijo)."""
+    rng = random.Random(semilla)
+    trabajo = tempfile.mkdtemp(prefix=f'bench_{tamano}_')
+    try:
+        generar_contenido(trabajo, tamano, rng)
+        os.chdir(trabajo)
+        sys.path.insert(0, DIRECTORIO_APP)
+        cliente = ClienteEnProceso()
+        cliente.app.inicializar()
+
+        # Primera carga de /master: parsea todo el grimorio
+        inicio = time.perf_counter()
+        cliente.pedir('GET', '/master')
+        master_frio = (time.perf_counter() - inicio) * 1000
+        master_caliente = medir(lambda: cliente.pedir('GET', '/master'), 5)
+
+        latencias, duracion, errores = simular_mesa(cliente, jugadores, segundos, tiempo_real, rng)
+        latencias['GET /master (frío)'] = [master_frio]
+        latencias['GET /master'] = master_caliente
+        micro = microbenchmarks(cliente.app, rng)
+        return {
+            'rutas': resumir(latencias, duracion),
+            'funciones': resumir(micro, 0),
+            'duracion_s': round(duracion, 3),
+            'errores': errores[:20],
+        }
+    finally:
+        os.chdir(DIRECTORIO_APP)
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+def imprimir(nombre, resultado):
+    print(f"\n=== {nombre} ({resultado['duracion_s']} s) ===")
+    print(f"{'ruta':45} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>8}")
+    for ruta, r in list(resultado['rutas'].items()) + list(resultado['funciones'].items()):
+        print(f"{ruta:45} {r['n']:6} {r['p50_ms']:8.2f}ms {r['p95_ms']:8.2f}ms {r['p99_ms']:8.2f}ms {r['rps']:8}")
+    for e in resultado['errores']:
+        print(f"  ⚠️  {e}")
+
+def comparar(resultados, base, tolerancia=TOLERANCIA):
+    """Lista de regresiones de p95 respecto a la línea base."""
+    regresiones = []
+    for nombre, resultado in resultados.items():
+        for grupo in ('rutas', 'funciones'):
+            for ruta, r in resultado.get(grupo, {}).items():
+                anterior = base.get(nombre, {}).get(grupo, {}).get(ruta)
+                # Por debajo de 1 ms el ruido manda; no lo contamos
+                if anterior and r['p95_ms'] > max(1.0, anterior['p95_ms'] * tolerancia):
+                    regresiones.append(f"{nombre} · {ruta}: p95 {anterior['p95_ms']} → {r['p95_ms']} ms")
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de una mesa en directo')
+    parser.add_argument('--jugadores', type=int, default=6, help='pantallas de jugador haciendo polling')
+    parser.add_argument('--segundos', type=int, default=30, help='duración simulada de la sesión')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=list(TAMANOS), help='nº de .md del grimorio')
+    parser.add_argument('--tiempo-real', action='store_true', help='respetar el ritmo real (1 Hz) en vez de ir a tope')
+    parser.add_argument('--url', help='servidor en marcha en vez de la app en proceso')
+    parser.add_argument('--mesa', default='bench', help='mesa del servidor que usa --url (nunca la principal)')
+    parser.add_argument('--semilla', type=int, default=1234)
+    parser.add_argument('--base', default=RUTA_BASE, help='archivo de línea base')
+    parser.add_argument('--guardar', action='store_true', help='guardar los resultados como línea base')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA, help='p95 / p95 base a partir del cual hay regresión')
+    parser.add_argument('--_uno', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._uno is not None:
+        resultado = ejecutar_tamano(args._uno, args.jugadores, args.segundos, args.tiempo_real, args.semilla)
+        print(json.dumps(resultado))
+        return
+
+    resultados = {}
+    if args.url:
+        from mesas import mesa_valida, MESA_POR_DEFECTO
+        if not mesa_valida(args.mesa) or args.mesa == MESA_POR_DEFECTO:
+            raise SystemExit(f'--mesa debe ser una mesa válida distinta de {MESA_POR_DEFECTO}')
+        latencias, duracion, errores = simular_mesa(ClienteHTTP(args.url, args.mesa), args.jugadores, args.segundos,
+                                                    args.tiempo_real, random.Random(args.semilla))
+        resultados['servidor'] = {'rutas': resumir(latencias, duracion), 'funciones': {},
+                                  'duracion_s': round(duracion, 3), 'errores': errores[:20]}
+    else:
+        # Cada tamaño en su propio proceso: BD, cachés y módulos limpios
+        for tamano in args.tamanos:
+            r = subprocess.run([sys.executable, os.path.abspath(__file__), '--_uno', str(tamano),
+                                '--jugadores', str(args.jugadores), '--segundos', str(args.segundos),
+                                '--semilla', str(args.semilla)] + (['--tiempo-real'] if args.tiempo_real else []),
+                               capture_output=True, text=True)
+            if r.returncode != 0:
+                print(r.stderr)
+                raise SystemExit(f'Falló el benchmark con {tamano} archivos')
+            resultados[f'{tamano} md'] = json.loads(r.stdout.strip().splitlines()[-1])
+
+    for nombre, resultado in resultados.items():
+        imprimir(nombre, resultado)
+
+    if args.guardar:
+        os.makedirs(os.path.dirname(args.base), exist_ok=True)
+        with open(args.base, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Línea base guardada en {args.base}")
+    elif os.path.exists(args.base):
+        with open(args.base, encoding='utf-8') as f:
+            regresiones = comparar(resultados, json.load(f), args.tolerancia)
+        if regresiones:
+            print("\n❌ Regresiones respecto a la línea base:")
+            for r in regresiones:
+                print(f"  {r}")
+            raise SystemExit(1)
+        print("\n✅ Sin regresiones respecto a la línea base")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import gzip
+import mimetypes
+import os
+import threading
+import time
+
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli  # Opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+# ========== COMPRESIÓN DE RESPUESTAS ==========
+# Las respuestas JSON/HTML grandes (el /master con el grimorio dentro, la
+# pizarra de Fabric.js, /api/characters...) se comprimen al vuelo con brotli
+# o gzip según lo que acepte el navegador. Los estáticos se sirven desde los
+# .br/.gz que deja precomprimir.py, sin coste de CPU en cada petición.
+
+UMBRAL_BYTES = 1024
+NIVEL_GZIP = 6
+CALIDAD_BROTLI = 5
+TIPOS_COMPRIMIBLES = ('application/json', 'text/html', 'text/css', 'text/plain',
+                      'application/javascript', 'text/javascript', 'image/svg+xml')
+
+# endpoint -> {'peticiones', 'comprimidas', 'bytes_original', 'bytes_enviados', 'ms_cpu'}
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _anotar(endpoint, original, enviados, ms_cpu, comprimida):
+    with _stats_lock:
+        s = _stats.setdefault(endpoint or '?', {'peticiones': 0, 'comprimidas': 0, 'bytes_original': 0,
+                                                'bytes_enviados': 0, 'ms_cpu': 0.0})
+        s['peticiones'] += 1
+        s['comprimidas'] += int(comprimida)
+        s['bytes_original'] += original
+        s['bytes_enviados'] += enviados
+        s['ms_cpu'] += ms_cpu
+
+def estadisticas():
+    """Bytes en el cable y CPU de compresión por endpoint."""
+    with _stats_lock:
+        copia = {k: dict(v) for k, v in _stats.items()}
+    for s in copia.values():
+        s['ratio'] = round(s['bytes_enviados'] / s['bytes_original'], 3) if s['bytes_original'] else 1.0
+        s['ms_cpu'] = round(s['ms_cpu'], 3)
+    return copia
+
+def elegir_codificacion():
+    """'br', 'gzip' o None según Accept-Encoding de la petición."""
+    aceptadas = request.accept_encodings
+    if brotli is not None and aceptadas['br']:
+        return 'br'
+    if aceptadas['gzip']:
+        return 'gzip'
+    return None
+
+def comprimir(datos, codificacion, calidad=None):
+    if codificacion == 'br':
+        return brotli.compress(datos, quality=CALIDAD_BROTLI if calidad is None else calidad)
+    return gzip.compress(datos, compresslevel=NIVEL_GZIP if calidad is None else calidad)
+
+def comprimir_respuesta(response):
+    """after_request: comprime respuestas dinámicas por encima del umbral."""
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in TIPOS_COMPRIMIBLES):
+        return response
+    # Aunque esta vaya sin comprimir, otra petición a la misma URL con otro
+    # Accept-Encoding podría ir comprimida: las cachés tienen que saberlo
+    response.vary.add('Accept-Encoding')
+    datos = response.get_data()
+    codificacion = elegir_codificacion() if len(datos) >= UMBRAL_BYTES else None
+    if codificacion is None:
+        _anotar(request.endpoint, len(datos), len(datos), 0.0, False)
+        return response
+
+    inicio = time.perf_counter()
+    comprimido = comprimir(datos, codificacion)
+    ms_cpu = (time.perf_counter() - inicio) * 1000
+    _anotar(request.endpoint, len(datos), len(comprimido), ms_cpu, True)
+
+    response.set_data(comprimido)
+    response.headers['Content-Encoding'] = codificacion
+    response.headers['Content-Length'] = str(len(comprimido))
+    response.vary.add('Accept-Encoding')
+    return response
+
+def json_cacheado(cache, clave, datos):
+    """Respuesta JSON de `datos` ya comprimida, reutilizada mientras `clave` no cambie.
+
+    Para lo que muchas pantallas piden cada segundo sin que cambie (la
+    pizarra): `cache` es un dict del llamante, codificación -> (clave, cuerpo,
+    bytes sin comprimir). comprimir_respuesta no vuelve a comprimirla porque ya
+    lleva Content-Encoding; la variante sin comprimir la anota él.
+    """
+    codificacion = elegir_codificacion()
+    entrada = cache.get(codificacion)
+    ms_cpu = 0.0
+    if entrada is None or entrada[0] != clave:
+        inicio = time.perf_counter()
+        cuerpo = current_app.json.dumps(datos).encode('utf-8')
+        original = len(cuerpo)
+        if codificacion is not None and original >= UMBRAL_BYTES:
+            cuerpo = comprimir(cuerpo, codificacion)
+        ms_cpu = (time.perf_counter() - inicio) * 1000
+        entrada = cache[codificacion] = (clave, cuerpo, original)
+    _, cuerpo, original = entrada
+    response = current_app.response_class(cuerpo, mimetype='application/json')
+    if codificacion is not None and original >= UMBRAL_BYTES:
+        _anotar(request.endpoint, original, len(cuerpo), ms_cpu, True)
+        response.headers['Content-Encoding'] = codificacion
+    response.vary.add('Accept-Encoding')
+    return response
+
+def servir_estatico(static_folder, filename):
+    """Sirve el .br/.gz hermano de un estático si existe y está al día."""
+    aceptadas = request.accept_encodings
+    ruta = safe_join(static_folder, filename)
+    if ruta is None:
+        return send_from_directory(static_folder, filename)
+    for cod, ext in (('br', '.br'), ('gzip', '.gz')):
+        hermano = ruta + ext
+        try:
+            # Si el original ha cambiado después de precomprimir, no vale
+            if not aceptadas[cod] or os.path.getmtime(hermano) < os.path.getmtime(ruta):
+                continue
+        except OSError:
+            continue
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(static_folder, filename + ext, mimetype=mimetype)
+        response.headers['Content-Encoding'] = cod
+        response.vary.add('Accept-Encoding')
+        _anotar('static', os.path.getsize(ruta), os.path.getsize(hermano), 0.0, True)
+        return response
+    return send_from_directory(static_folder, filename)
+
+def registrar(app):
+    """Activa la compresión en la app Flask."""
+    app.after_request(comprimir_respuesta)
+    app.view_functions['static'] = lambda filename: servir_estatico(app.static_folder, filename)
@@ -0,0 +1,219 @@
+import re
+from functools import lru_cache
+from math import comb
+
+import numpy as np  # Requiere: pip install numpy
+
+# ========== MOTOR DE DADOS ==========
+# Expresiones tipo "4d8+2", "2d6", "d20", "4d6kh3" (quedarse con los 3 más
+# altos), "2d20kl1" (el más bajo) o "d20 ventaja"/"d20 desventaja".
+# Cada expresión se compila una vez y se tira N veces en una sola llamada
+# vectorizada de NumPy; la distribución exacta se calcula por convolución.
+
+MAX_DADOS = 1000
+MAX_CARAS = 1000
+MAX_TIRADAS = 100000
+MAX_DADOS_QUEDARSE = 20
+# Límites de trabajo: sin ellos "1000d1000" en /api/dice/stats tarda minutos
+# y tirarlo 100000 veces reserva ~800 MB
+MAX_TERMINOS = 20
+MAX_DADOS_X_CARAS = 100000        # por término
+MAX_DADOS_TIRADOS = 2000000       # n × dados de toda la expresión
+MAX_RESULTADOS = 20000            # valores posibles de la distribución exacta
+MAX_TRABAJO_QUEDARSE = 200000000  # pasos estimados de la DP de kh/kl (~1 s)
+
+_TERMINO = re.compile(r'([+-])?\s*(?:(\d*)d(\d+)(?:(kh|kl)(\d+))?|(\d+))', re.IGNORECASE)
+_ESPACIOS_OPERADOR = re.compile(r'\s*([+-])\s*')
+_ALIAS = [
+    (re.compile(r'\b(\d*)d20\s*(?:ventaja|adv)\b', re.IGNORECASE), '2d20kh1'),
+    (re.compile(r'\b(\d*)d20\s*(?:desventaja|dis)\b', re.IGNORECASE), '2d20kl1'),
+]
+
+class ErrorDados(ValueError):
+    pass
+
+class TerminoDados:
+    """`cantidad` dados de `caras` caras, quedándose opcionalmente con algunos."""
+
+    def __init__(self, signo, cantidad, caras, modo=None, quedarse=None):
+        self.signo = signo
+        self.cantidad = cantidad
+        self.caras = caras
+        self.modo = modo          # None, 'kh' o 'kl'
+        self.quedarse = quedarse if modo else cantidad
+
+    def tirar(self, n, rng):
+        tiradas = rng.integers(1, self.caras + 1, size=(n, self.cantidad))
+        if self.modo and self.quedarse < self.cantidad:
+            tiradas.sort(axis=1)
+            tiradas = tiradas[:, -self.quedarse:] if self.modo == 'kh' else tiradas[:, :self.quedarse]
+        return self.signo * tiradas.sum(axis=1)
+
+    @property
+    def resultados(self):
+        """Nº de valores distintos que puede sacar el término."""
+        return self.quedarse * (self.caras - 1) + 1
+
+    def trabajo_quedarse(self):
+        """Pasos aproximados de _distribucion_quedarse: caras × estados × reparto × sumas."""
+        return self.caras * (self.cantidad + 1) ** 2 * (self.quedarse + 1) * self.resultados
+
+    def distribucion(self):
+        """(valor mínimo, probabilidades) del término sin signo."""
+        if self.modo and self.quedarse < self.cantidad:
+            if self.cantidad > MAX_DADOS_QUEDARSE:
+                raise ErrorDados(f'Distribución exacta limitada a {MAX_DADOS_QUEDARSE} dados con kh/kl')
+            if self.trabajo_quedarse() > MAX_TRABAJO_QUEDARSE:
+                raise ErrorDados('Demasiadas caras o dados para la distribución exacta con kh/kl')
+            return _distribucion_quedarse(self.cantidad, self.caras, self.quedarse, self.modo)
+        return _distribucion_suma(self.cantidad, self.caras)
+
+class Expresion:
+    """Expresión de dados ya compilada."""
+
+    def __init__(self, texto, terminos, constante):
+        self.texto = texto
+        self.terminos = terminos
+        self.constante = constante
+
+    def tirar(self, n=1, rng=None):
+        """Devuelve un array de `n` resultados."""
+        if not 1 <= n <= MAX_TIRADAS:
+            raise ErrorDados(f'El número de tiradas debe estar entre 1 y {MAX_TIRADAS}')
+        if n * sum(t.cantidad for t in self.terminos) > MAX_DADOS_TIRADOS:
+            raise ErrorDados(f'Demasiados dados: n × dados no puede pasar de {MAX_DADOS_TIRADOS}')
+        rng = rng or _rng
+        total = np.full(n, self.constante, dtype=np.int64)
+        for termino in self.terminos:
+            total += termino.tirar(n, rng)
+        return total
+
+    def distribucion(self):
+        """(valor mínimo, array de probabilidades) exactos de la expresión."""
+        if sum(t.resultados - 1 for t in self.terminos) + 1 > MAX_RESULTADOS:
+            raise ErrorDados(f'Distribución exacta limitada a {MAX_RESULTADOS} resultados posibles')
+        minimo, probs = self.constante, np.ones(1)
+        for termino in self.terminos:
+            t_min, t_probs = termino.distribucion()
+            if termino.signo < 0:
+                # -X toma valores de -max a -min: invertimos el array
+                t_min, t_probs = -(t_min + len(t_probs) - 1), t_probs[::-1]
+            minimo += t_min
+            probs = np.convolve(probs, t_probs)
+        return minimo, probs
+
+    def estadisticas(self):
+        minimo, probs = self.distribucion()
+        valores = np.arange(minimo, minimo + len(probs))
+        media = float(np.dot(valores, probs))
+        varianza = float(np.dot((valores - media) ** 2, probs))
+        acumulada = np.cumsum(probs)
+        return {
+            'expr': self.texto,
+            'min': int(valores[0]),
+            'max': int(valores[-1]),
+            'media': round(media, 4),
+            'desviacion': round(varianza ** 0.5, 4),
+            'mediana': int(valores[np.searchsorted(acumulada, 0.5)]),
+            'distribucion': {int(v): float(p) for v, p in zip(valores, probs) if p > 0},
+        }
+
+def compilar(texto):
+    """Parsea una expresión de dados. Lanza ErrorDados si no es válida."""
+    if not isinstance(texto, str):
+        raise ErrorDados('La expresión debe ser un texto')
+    return _compilar(texto)
+
+def _alias(m, reemplazo, texto):
+    # Ventaja y desventaja son de un solo d20: "3d20 ventaja" no se reinterpreta
+    if m.group(1) and int(m.group(1)) != 1:
+        raise ErrorDados(f'Ventaja y desventaja se aplican a un solo d20: {texto}')
+    return reemplazo
+
+@lru_cache(maxsize=256)
+def _compilar(texto):
+    if not texto.strip():
+        raise ErrorDados('Expresión vacía')
+    limpio = texto.strip()
+    for patron, reemplazo in _ALIAS:
+        limpio = patron.sub(lambda m, r=reemplazo: _alias(m, r, texto), limpio)
+    # Solo quitamos espacios junto a + y -: "4d8 2" (un '+' sin escapar en la
+    # URL) es un error, no el dado "4d82"
+    limpio = _ESPACIOS_OPERADOR.sub(r'\1', limpio)
+    if any(c.isspace() for c in limpio):
+        raise ErrorDados(f'Falta un + o - entre dos términos en: {texto} (en una URL, escribe + como %2B)')
+
+    terminos, constante, pos = [], 0, 0
+    while pos < len(limpio):
+        m = _TERMINO.match(limpio, pos)
+        if not m or m.end() == pos or (pos > 0 and not m.group(1)):
+            raise ErrorDados(f'Expresión no válida: {texto}')
+        signo = -1 if m.group(1) == '-' else 1
+        if m.group(6) is not None:
+            constante += signo * int(m.group(6))
+        else:
+            cantidad = int(m.group(2) or 1)
+            caras = int(m.group(3))
+            modo = m.group(4).lower() if m.group(4) else None
+            quedarse = int(m.group(5)) if modo else None
+            if not 1 <= cantidad <= MAX_DADOS or not 1 <= caras <= MAX_CARAS:
+                raise ErrorDados(f'Demasiados dados o caras en: {texto}')
+            if cantidad * caras > MAX_DADOS_X_CARAS:
+                raise ErrorDados(f'Dados × caras no puede pasar de {MAX_DADOS_X_CARAS} en un término')
+            if modo and not 1 <= quedarse <= cantidad:
+                raise ErrorDados(f'No puedes quedarte con {quedarse} de {cantidad} dados')
+            terminos.append(TerminoDados(signo, cantidad, caras, modo, quedarse))
+            if len(terminos) > MAX_TERMINOS:
+                raise ErrorDados(f'Máximo {MAX_TERMINOS} términos de dados por expresión')
+        pos = m.end()
+    return Expresion(texto.strip(), tuple(terminos), constante)
+
+def tirar(texto, n=1, rng=None):
+    """Atajo: compila (cacheado) y tira `n` veces."""
+    return compilar(texto).tirar(n, rng)
+
+# ========== DISTRIBUCIONES EXACTAS ==========
+@lru_cache(maxsize=256)
+def _distribucion_suma(cantidad, caras):
+    """Suma de `cantidad` dados: convolución por cuadrados sucesivos."""
+    dado = np.full(caras, 1.0 / caras)
+    resultado, base, k = np.ones(1), dado, cantidad
+    while k:
+        if k & 1:
+            resultado = np.convolve(resultado, base)
+        k >>= 1
+        if k:
+            base = np.convolve(base, base)
+    return cantidad, resultado
+
+@lru_cache(maxsize=256)
+def _distribucion_quedarse(cantidad, caras, quedarse, modo):
+    """Suma de los `quedarse` dados más altos (kh) o más bajos (kl).
+
+    Recorremos las caras de la mejor a la peor decidiendo cuántos dados
+    sacan cada valor; los primeros `quedarse` en salir son los que cuentan.
+    Contamos resultados con enteros exactos y dividimos al final.
+    """
+    orden = range(caras, 0, -1) if modo == 'kh' else range(1, caras + 1)
+    # estado: (dados asignados, dados que cuentan) -> {suma: nº de resultados}
+    estados = {(0, 0): {0: 1}}
+    for valor in orden:
+        nuevos = {}
+        for (usados, contados), sumas in estados.items():
+            libres = cantidad - usados
+            for j in range(libres + 1):
+                formas = comb(libres, j)
+                cuentan = min(j, quedarse - contados)
+                clave = (usados + j, contados + cuentan)
+                destino = nuevos.setdefault(clave, {})
+                extra = cuentan * valor
+                for suma, veces in sumas.items():
+                    destino[suma + extra] = destino.get(suma + extra, 0) + veces * formas
+        estados = nuevos
+    sumas = estados[(cantidad, quedarse)]
+    minimo, maximo = min(sumas), max(sumas)
+    total = caras ** cantidad
+    probs = np.array([sumas.get(s, 0) / total for s in range(minimo, maximo + 1)])
+    return minimo, probs
+
+_rng = np.random.default_rng()
@@ -4,6 +4,7 @@ import zipfile
 import re
 import time
 from deep_translator import GoogleTranslator
+import glosario
 
 # URL del JSON comunitario con los conjuros del SRD 5.2 (2024)
 URL_CONJUROS = "https://gist.githubusercontent.com/dmcb/4b67869f962e3adaa3d0f7e5ca8f4912/raw/"
@@ -23,21 +24,9 @@ traductor = GoogleTranslator(source='en', target='es')
 def corregir_terminologia(texto):
     """
     Arregla traducciones literales para que suenen a D&D.
+    Las correcciones viven en glosario.txt y se aplican en una sola pasada.
     """
-    if not texto: return ""
-    t = texto
-    # Correcciones comunes de la traducción automática
-    t = t.replace("Tirada de salvación de destreza", "Tirada de salvación de Destreza")
-    t = t.replace("espacio de hechizo", "espacio de conjuro")
-    t = t.replace("spell slot", "espacio de conjuro")
-    t = t.replace("hit points", "puntos de golpe")
-    t = t.replace("puntos de vida", "puntos de golpe")
-    t = t.replace("saving throw", "tirada de salvación")
-    t = t.replace("attack roll", "tirada de ataque")
-    t = t.replace("Action", "Acción").replace("Bonus Action", "Acción Adicional").replace("Reaction", "Reacción")
-    t = t.replace("Instantaneous", "Instantánea").replace("Concentration", "Concentración")
-    t = t.replace("Self", "Personal").replace("Touch", "Toque")
-    return t
+    return glosario.corregir(texto)
 
 def traducir_bloque(texto):
     if not texto: return ""
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+
+from instantaneas import PATRON_MEDIO, ruta_medio
+
+# ========== LISTA DE ESCENAS ==========
+# El máster encola las próximas escenas (imagen, vídeo, tarjeta, iniciativa,
+# YouTube) y las pantallas de jugador reciben un manifiesto de precarga con
+# las URLs y tamaños de lo que viene. Cada pantalla descarga y decodifica esos
+# medios en segundo plano y avisa de qué tiene listo, así que "ir a la escena
+# N" cambia al instante en vez de empezar a descargar en ese momento.
+
+TIPOS_ESCENA = ('image', 'video', 'info_card', 'initiative', 'youtube')
+VENTANA_PRECARGA = 3        # escenas siguientes a la actual que se precargan
+CADUCIDAD_PRECARGA_S = 10   # el estado de precarga de una pantalla que no informa en 10 s se olvida
+MAX_ESCENAS = 200
+EXTENSIONES_VIDEO = ('.mp4', '.webm', '.mov')
+CAMPOS_TEXTO = ('url', 'video_id', 'html', 'title')  # se guardan y luego se recorren como texto
+
+class ErrorEscena(ValueError):
+    pass
+
+def normalizar(escena):
+    """Valida una escena del máster y la deja en {'type', 'data', 'titulo'}."""
+    if not isinstance(escena, dict) or escena.get('type') not in TIPOS_ESCENA:
+        raise ErrorEscena(f"Tipo de escena no válido, usa uno de: {', '.join(TIPOS_ESCENA)}")
+    data = escena.get('data') or {}
+    tipo = escena['type']
+    if not isinstance(data, dict):
+        raise ErrorEscena("data debe ser un objeto")
+    for campo in CAMPOS_TEXTO:
+        if data.get(campo) is not None and not isinstance(data[campo], str):
+            raise ErrorEscena(f"data.{campo} debe ser texto")
+    if escena.get('titulo') is not None and not isinstance(escena['titulo'], str):
+        raise ErrorEscena("titulo debe ser texto")
+    if tipo in ('image', 'video') and not data.get('url'):
+        raise ErrorEscena(f"La escena '{tipo}' necesita data.url")
+    if tipo == 'youtube' and not data.get('video_id'):
+        raise ErrorEscena("La escena 'youtube' necesita data.video_id")
+    if tipo == 'video':
+        data = dict(data, autoplay=data.get('autoplay', True))
+    if tipo == 'info_card':
+        data = dict(data, title=data.get('title') or '', html=data.get('html') or '')
+    titulo = escena.get('titulo') or data.get('title') or data.get('url') or data.get('video_id') or tipo
+    return {'type': tipo, 'data': data, 'titulo': str(titulo)}
+
+def medios(escena):
+    """URLs locales que hay que tener descargadas para mostrar la escena."""
+    data = escena.get('data') or {}
+    if escena['type'] in ('image', 'video'):
+        urls = [data['url']]
+    elif escena['type'] == 'info_card':
+        html = data.get('html')
+        # <img> dentro de la tarjeta; se comprueba el tipo por si escenas.json es de antes de validarlo
+        urls = PATRON_MEDIO.findall(html) if isinstance(html, str) else []
+    else:
+        return []  # la iniciativa no tiene medios y YouTube no se puede precargar
+    return list(dict.fromkeys(urls))
+
+def _tamano(url):
+    """Bytes del archivo si la URL es de /static/, None si es externa, no existe o sale de static/."""
+    ruta = ruta_medio(url)
+    if ruta is None:
+        return None
+    try:
+        return os.path.getsize(ruta)
+    except OSError:
+        return None
+
+def manifiesto(escenas, actual, ventana=VENTANA_PRECARGA):
+    """Medios de la escena actual y de las `ventana` siguientes, sin repetir."""
+    inicio = max(actual, 0)
+    recursos = {}
+    for indice in range(inicio, min(inicio + ventana + 1, len(escenas))):
+        escena = escenas[indice]
+        for url in medios(escena):
+            if url not in recursos:
+                recursos[url] = {'url': url, 'tipo': 'video' if url.lower().endswith(EXTENSIONES_VIDEO) else 'image',
+                                 'bytes': _tamano(url), 'escena': indice}
+    return list(recursos.values())
+
+class EstadoPrecarga:
+    """Lo que cada pantalla de jugador dice tener ya descargado."""
+
+    def __init__(self):
+        self._pantallas = {}  # id -> (instante, conjunto de URLs listas, URLs fallidas)
+        self._lock = threading.Lock()
+
+    def anotar(self, pantalla, listas, fallidas=()):
+        with self._lock:
+            self._pantallas[pantalla] = (time.monotonic(), frozenset(listas), frozenset(fallidas))
+
+    def _activas(self):
+        limite = time.monotonic() - CADUCIDAD_PRECARGA_S
+        with self._lock:
+            for pantalla in [p for p, (t, _, _) in self._pantallas.items() if t < limite]:
+                del self._pantallas[pantalla]
+            return dict(self._pantallas)
+
+    def resumen(self, escenas):
+        """Por escena: cuántas pantallas la tienen lista y si alguna falló."""
+        pantallas = self._activas()
+        estado = []
+        for escena in escenas:
+            urls = medios(escena)
+            listas = sum(1 for _, ok, _ in pantallas.values() if all(u in ok for u in urls))
+            fallos = sorted({u for _, _, mal in pantallas.values() for u in urls if u in mal})
+            estado.append({'listas': listas, 'pantallas': len(pantallas),
+                           'lista': bool(pantallas) and listas == len(pantallas), 'fallidas': fallos})
+        return estado
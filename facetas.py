@@ -0,0 +1,150 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+# ========== ÍNDICE DE FACETAS DEL GRIMORIO ==========
+# Índice invertido por campo del frontmatter: valor normalizado -> slugs.
+# Los filtros (?school=Evocación&level=3&cr_max=2) se resuelven con
+# intersecciones de conjuntos y las facetas se cuentan sobre el resultado,
+# sin recorrer la lista entera en cada búsqueda.
+
+_FRACCIONES = {'½': '1/2', '¼': '1/4', '⅛': '1/8'}
+
+def numero_desafio(valor):
+    """'1 /4' -> 0.25, '½' -> 0.5, '0.25' -> 0.25, '5' -> 5.0. None si no se entiende."""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return float(valor)  # YAML ya lo da como número (desafio: 0.5)
+    texto = str(valor).strip()
+    for simbolo, fraccion in _FRACCIONES.items():
+        texto = texto.replace(simbolo, fraccion)
+    m = re.match(r'^(\d+(?:[.,]\d+)?)\s*(?:/\s*(\d+))?', texto)
+    if not m:
+        return None
+    numero = float(m.group(1).replace(',', '.'))
+    if m.group(2):
+        return numero / (int(m.group(2)) or 1)
+    return numero
+
+def numero_nivel(valor):
+    """'Nivel 3' -> 3.0, 'Truco' -> 0.0."""
+    texto = str(valor).strip().lower()
+    if texto.startswith(('truco', 'cantrip')):
+        return 0.0
+    m = re.search(r'\d+', texto)
+    return float(m.group()) if m else None
+
+def numero_entero(valor):
+    """'15 (armadura natural)' -> 15.0."""
+    m = re.match(r'^\s*(-?\d+)', str(valor))
+    return float(m.group(1)) if m else None
+
+def texto_normalizado(valor):
+    """Minúsculas y sin tildes, para que 'Evocacion' encuentre 'Evocación'."""
+    texto = unicodedata.normalize('NFKD', str(valor).strip().casefold())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+# tipo de contenido -> {campo del frontmatter: normalizador}. Los numéricos
+# admiten además filtros de rango <alias>_min / <alias>_max.
+CAMPOS = {
+    'monster': {'desafio': numero_desafio, 'tipo': texto_normalizado,
+                'tamaño': texto_normalizado, 'ac': numero_entero},
+    'spell': {'level': numero_nivel, 'school': texto_normalizado, 'tiempo': texto_normalizado},
+    'rule': {'category': texto_normalizado},
+}
+NUMERICOS = {numero_desafio, numero_nivel, numero_entero}
+
+# Nombres alternativos de los parámetros de la URL
+ALIAS = {'cr': 'desafio', 'type': 'tipo', 'size': 'tamaño', 'tamano': 'tamaño',
+         'nivel': 'level', 'escuela': 'school', 'categoria': 'category'}
+
+class IndiceFacetas:
+    """Índice invertido de un tipo de contenido."""
+
+    def __init__(self, tipo, items):
+        self.tipo = tipo
+        self.campos = CAMPOS.get(tipo, {})
+        self.items = items
+        self.posicion = {item['slug']: i for i, item in enumerate(items)}
+        self.todos = frozenset(self.posicion)
+        self.invertido = {campo: {} for campo in self.campos}
+        self.etiquetas = {campo: {} for campo in self.campos}
+        for item in items:
+            for campo, normalizar in self.campos.items():
+                if item.get(campo) in (None, ''):
+                    continue
+                clave = normalizar(item[campo])
+                if clave is None or clave == '':
+                    continue
+                self.invertido[campo].setdefault(clave, set()).add(item['slug'])
+                # Primera grafía vista como etiqueta para mostrar
+                self.etiquetas[campo].setdefault(clave, str(item[campo]).strip())
+        # Valores ordenados de los campos numéricos, para los rangos con bisect
+        self.ordenados = {campo: sorted(self.invertido[campo]) for campo, n in self.campos.items()
+                          if n in NUMERICOS}
+
+    def _campo(self, nombre):
+        nombre = ALIAS.get(nombre, nombre)
+        return nombre if nombre in self.campos else None
+
+    def filtrar(self, parametros):
+        """Conjunto de slugs que cumplen todos los filtros reconocidos."""
+        resultado = self.todos
+        for clave, valor in parametros.items():
+            sufijo = None
+            if clave.endswith(('_min', '_max')):
+                clave, sufijo = clave[:-4], clave[-3:]
+            campo = self._campo(clave)
+            if campo is None or valor in (None, ''):
+                continue
+            normalizar = self.campos[campo]
+            objetivo = normalizar(valor)
+            if objetivo is None:
+                return frozenset()
+            if sufijo:
+                if campo not in self.ordenados:
+                    continue
+                valores = self.ordenados[campo]
+                if sufijo == 'min':
+                    seleccion = valores[bisect_left(valores, objetivo):]
+                else:
+                    seleccion = valores[:bisect_right(valores, objetivo)]
+                coincidencias = set().union(*(self.invertido[campo][v] for v in seleccion))
+            else:
+                coincidencias = self.invertido[campo].get(objetivo, set())
+            resultado = resultado & coincidencias
+            if not resultado:
+                break
+        return resultado
+
+    def contar(self, slugs):
+        """{campo: [{'valor', 'n'}]} de los valores presentes en `slugs`."""
+        facetas = {}
+        for campo, valores in self.invertido.items():
+            conteo = []
+            for clave, conjunto in valores.items():
+                n = len(conjunto) if slugs is self.todos else len(conjunto & slugs)
+                if n:
+                    conteo.append({'valor': self.etiquetas[campo][clave], 'n': n})
+            numerico = campo in self.ordenados
+            conteo.sort(key=lambda c: self.campos[campo](c['valor']) if numerico else -c['n'])
+            facetas[campo] = conteo
+        return facetas
+
+    def ordenar(self, slugs):
+        """Items de `slugs` en el orden del grimorio (por nombre)."""
+        return [self.items[i] for i in sorted(self.posicion[s] for s in slugs)]
+
+_indices = {}
+_lock = threading.Lock()
+
+def indice_para(tipo, items):
+    """Índice de `items`, reconstruido solo si la lista ha cambiado."""
+    cacheado = _indices.get(tipo)
+    if cacheado is not None and cacheado.items is items:
+        return cacheado
+    with _lock:
+        cacheado = _indices.get(tipo)
+        if cacheado is None or cacheado.items is not items:
+            cacheado = _indices[tipo] = IndiceFacetas(tipo, items)
+        return cacheado
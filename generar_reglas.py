@@ -1,6 +1,7 @@
 import os
 import zipfile
 import re
+import glosario
 
 DIRECTORIO_SALIDA = "rules"
 
@@ -343,7 +344,7 @@ nombre: "{regla['nombre']}"
 category: "{regla['categoria']}"
 ---
 
-{regla['descripcion']}
+{glosario.corregir(regla['descripcion'])}
 """
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write(md_content)
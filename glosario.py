@@ -0,0 +1,211 @@
+import argparse
+import os
+import re
+import time
+from functools import lru_cache
+
+# ========== CORRECTOR DE TERMINOLOGÍA ==========
+# Carga glosario.txt y lo compila en una única expresión regular (un trie de
+# todas las entradas, la más larga primero, palabras completas), de modo que
+# el texto se reescribe en una sola pasada en vez de con una cadena de
+# str.replace que copia el texto entero en cada paso y en la que el orden
+# importa ("Bonus Action" nunca encajaba tras sustituir "Action").
+#
+# Se usa desde descargar_conjuros.py y generar_reglas.py, y desde la línea
+# de comandos para normalizar .md caseros:
+#
+#   python glosario.py monsters/mi_dragon.md      # corrige en el sitio
+#   python glosario.py --probar spells/*.md       # solo muestra los cambios
+#   python glosario.py --benchmark spells         # compara con str.replace
+
+RUTA_GLOSARIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'glosario.txt')
+
+def leer_entradas(ruta=RUTA_GLOSARIO):
+    """Lista de (origen, destino) en el orden del archivo."""
+    entradas = []
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for num, linea in enumerate(f, 1):
+            linea = linea.strip()
+            if not linea or linea.startswith('#'):
+                continue
+            if '=>' not in linea:
+                raise ValueError(f"{ruta}:{num}: falta '=>' en '{linea}'")
+            origen, destino = (parte.strip() for parte in linea.split('=>', 1))
+            if origen:
+                entradas.append((origen, destino))
+    return entradas
+
+def _aplicar_mayusculas(original, destino):
+    """Copia la capitalización de `original` a `destino`."""
+    if original.isupper() and len(original) > 1:
+        return destino.upper()
+    if original[:1].isupper():
+        return destino[:1].upper() + destino[1:]
+    return destino
+
+def _patron_trie(claves):
+    """Regex con los prefijos comunes factorizados: 'ab(?:c|d)' en vez de 'abc|abd'.
+
+    Así el motor no prueba cada entrada por separado en cada posición, y como
+    las continuaciones son voraces siempre se queda con la más larga.
+    """
+    trie = {}
+    for clave in claves:
+        nodo = trie
+        for c in clave:
+            nodo = nodo.setdefault(c, {})
+        nodo[''] = {}
+
+    def convertir(nodo):
+        fin = '' in nodo
+        ramas = [re.escape(c) + convertir(hijo) for c, hijo in sorted(nodo.items()) if c]
+        if not ramas:
+            return ''
+        cuerpo = ramas[0] if len(ramas) == 1 else '(?:' + '|'.join(ramas) + ')'
+        if fin:
+            return ('(?:' + cuerpo + ')?') if len(ramas) == 1 else cuerpo + '?'
+        return cuerpo
+
+    return convertir(trie)
+
+def _es_palabra(c):
+    return c.isalnum() or c == '_'
+
+class Glosario:
+    """Glosario compilado en un único patrón."""
+
+    def __init__(self, entradas):
+        self.exactas = {}
+        self.sin_mayusculas = {}
+        for origen, destino in entradas:
+            if origen == origen.lower():
+                self.sin_mayusculas.setdefault(origen, destino)
+            else:
+                self.exactas.setdefault(origen, destino)
+        # El patrón busca sin distinguir mayúsculas; qué entrada aplica (y si
+        # la mayúscula cuadra con una entrada exacta) se decide en _resolver
+        self.claves = tuple(sorted({o.lower() for o in list(self.exactas) + list(self.sin_mayusculas)}))
+        self.patron = self._compilar(self.claves) if self.claves else None
+
+    @lru_cache(maxsize=64)
+    def _compilar(self, claves):
+        return re.compile(r'(?<!\w)' + _patron_trie(claves), re.IGNORECASE)
+
+    def _patron_para(self, texto):
+        """Patrón solo con las entradas que aparecen en `texto`.
+
+        Un `in` por entrada sobre el texto en minúsculas es una búsqueda en C
+        mucho más rápida que recorrer el texto con la regex completa; la
+        mayoría de bloques no contienen ninguna entrada y salen sin regex.
+        """
+        if len(self.claves) > 64:
+            return self.patron
+        bajo = texto.lower()
+        presentes = tuple(c for c in self.claves if c in bajo)
+        return self._compilar(presentes) if presentes else None
+
+    def _resolver(self, texto, inicio, largo_max):
+        """(sustitución, longitud) de la entrada más larga que acaba en límite de palabra."""
+        for largo in range(largo_max, 0, -1):
+            fin = inicio + largo
+            if fin < len(texto) and _es_palabra(texto[fin]):
+                continue  # "Action" dentro de "Actions" no cuenta
+            trozo = texto[inicio:fin]
+            if trozo in self.exactas:
+                return self.exactas[trozo], largo
+            destino = self.sin_mayusculas.get(trozo.lower())
+            if destino is not None:
+                return _aplicar_mayusculas(trozo, destino), largo
+        return None, 0
+
+    def corregir(self, texto):
+        if not texto or self.patron is None:
+            return texto or ""
+        patron = self._patron_para(texto)
+        if patron is None:
+            return texto
+        partes, pos = [], 0
+        m = patron.search(texto)
+        while m:
+            inicio = m.start()
+            sustitucion, largo = self._resolver(texto, inicio, m.end() - inicio)
+            if sustitucion is None:
+                m = patron.search(texto, inicio + 1)
+                continue
+            partes.append(texto[pos:inicio])
+            partes.append(sustitucion)
+            pos = inicio + largo
+            m = patron.search(texto, pos)
+        partes.append(texto[pos:])
+        return ''.join(partes)
+
+@lru_cache(maxsize=None)
+def cargar(ruta=RUTA_GLOSARIO):
+    """Glosario compilado (una vez por proceso)."""
+    return Glosario(leer_entradas(ruta))
+
+def corregir(texto, ruta=RUTA_GLOSARIO):
+    return cargar(ruta).corregir(texto)
+
+# ========== LÍNEA DE COMANDOS ==========
+def _corregir_encadenado(texto, entradas):
+    """El método antiguo, solo para comparar: un str.replace por entrada."""
+    for origen, destino in entradas:
+        texto = texto.replace(origen, destino)
+    return texto
+
+def _archivos_md(rutas):
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            for nombre in sorted(os.listdir(ruta)):
+                if nombre.endswith('.md'):
+                    yield os.path.join(ruta, nombre)
+        else:
+            yield ruta
+
+def benchmark(rutas, repeticiones=20):
+    textos = []
+    for ruta in _archivos_md(rutas):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            textos.append(f.read())
+    if not textos:
+        print("No hay archivos .md que medir")
+        return
+    entradas = leer_entradas()
+    glosario = cargar()
+    total = sum(len(t) for t in textos)
+    for nombre, funcion in (("str.replace encadenado", lambda t: _corregir_encadenado(t, entradas)),
+                            ("una pasada (glosario)", glosario.corregir)):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            for t in textos:
+                funcion(t)
+        ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+        print(f"{nombre:24} {ms:8.2f} ms por corpus ({len(textos)} archivos, {total / 1e6:.2f} MB)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Normaliza la terminología de archivos .md')
+    parser.add_argument('rutas', nargs='+', help='archivos .md o carpetas')
+    parser.add_argument('--probar', action='store_true', help='no escribir, solo decir qué cambiaría')
+    parser.add_argument('--benchmark', action='store_true', help='medir contra la cadena de str.replace')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.rutas)
+        return
+
+    cambiados = 0
+    for ruta in _archivos_md(args.rutas):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            texto = f.read()
+        corregido = corregir(texto)
+        if corregido != texto:
+            cambiados += 1
+            print(f"✏️  {ruta}")
+            if not args.probar:
+                with open(ruta, 'w', encoding='utf-8') as f:
+                    f.write(corregido)
+    print(f"✅ {cambiados} archivos {'a corregir' if args.probar else 'corregidos'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+
+# ========== HISTORIAL DE LA PIZARRA ==========
+# Cada guardado de la pizarra es una versión. En vez de copiar el lienzo
+# entero cada vez (un mapa de batalla cargado pesa megas y cada trazo lo
+# reescribe), guardamos:
+#   - un fotograma clave (el JSON completo, comprimido) cada CADA_CLAVE versiones,
+#   - entre medias, deltas comprimidos: cuántos objetos de Fabric se conservan
+#     del principio de la lista y cuáles vienen detrás. Un trazo nuevo es un
+#     delta de un objeto; borrar la pizarra es un delta vacío.
+# Un fotograma clave y sus deltas forman un segmento, que va en disco en
+# mesas/<mesa>/pizarra_historial/seg_<versión>.bin (se escribe cada versión
+# al momento, así que el historial sobrevive a un reinicio). En memoria solo
+# quedan los segmentos más recientes que quepan en el presupuesto; cuando el
+# disco se pasa del suyo se borran los segmentos más antiguos.
+#
+# Ir a cualquier versión cuesta como mucho un fotograma clave y
+# CADA_CLAVE - 1 deltas, da igual lo largo que sea el historial.
+#
+#   python historial_pizarra.py --medir    # memoria y tiempos con un mapa cargado
+
+CADA_CLAVE = 25
+MEMORIA_BYTES = 4 * 1024 * 1024
+DISCO_BYTES = 64 * 1024 * 1024
+NIVEL_ZLIB = 6
+
+CLAVE, DELTA = 0, 1
+_CABECERA = struct.Struct('>IIBdI')  # versión, padre, tipo, instante, longitud
+
+def _huella(objeto):
+    # Fabric serializa siempre las propiedades en el mismo orden: sin sort_keys
+    texto = json.dumps(objeto, separators=(',', ':'))
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=8).digest()
+
+def _descomponer(state):
+    """(meta, objetos) de un JSON de Fabric, o None si no lo parece."""
+    try:
+        datos = json.loads(state)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(datos, dict) or not isinstance(datos.get('objects'), list):
+        return None
+    objetos = datos.pop('objects')
+    return datos, objetos
+
+class _Segmento:
+    """Un fotograma clave y los deltas que le siguen."""
+
+    def __init__(self, inicio, ruta):
+        self.inicio = inicio
+        self.ruta = ruta
+        self.registros = None  # [(versión, padre, tipo, instante, bytes comprimidos)] si está en memoria
+        self.fin = inicio      # última versión del segmento
+        self.bytes_disco = 0
+
+    def cargar(self):
+        registros = []
+        with open(self.ruta, 'rb') as f:
+            datos = f.read()
+        pos = 0
+        while pos + _CABECERA.size <= len(datos):
+            version, padre, tipo, instante, largo = _CABECERA.unpack_from(datos, pos)
+            inicio = pos + _CABECERA.size
+            if inicio + largo > len(datos):
+                break
+            registros.append((version, padre, tipo, instante, datos[inicio:inicio + largo]))
+            pos = inicio + largo
+        if pos < len(datos):
+            # Registro a medias de una caída: lo cortamos para poder seguir añadiendo
+            os.truncate(self.ruta, pos)
+        self.registros = registros
+        self.bytes_disco = pos
+        if registros:
+            self.fin = registros[-1][0]
+        return registros
+
+    @property
+    def bytes_memoria(self):
+        return sum(len(r[4]) for r in self.registros) if self.registros else 0
+
+class HistorialPizarra:
+    """Historial acotado de versiones de la pizarra de una mesa."""
+
+    def __init__(self, carpeta, cada_clave=CADA_CLAVE, memoria=MEMORIA_BYTES, disco=DISCO_BYTES):
+        self.carpeta = carpeta
+        self.cada_clave = cada_clave
+        self.memoria = memoria
+        self.disco = disco
+        self._lock = threading.RLock()
+        self._segmentos = OrderedDict()  # inicio -> _Segmento, del más antiguo al más nuevo
+        self._en_memoria = OrderedDict()  # inicio -> None, orden LRU
+        # Versión sobre la que se dibuja ahora (cambia al deshacer) y sus
+        # huellas por objeto, para calcular el delta del próximo guardado
+        self.actual = None
+        self._meta = None
+        self._huellas = None
+        self._rehacer = []  # versiones deshechas, para rehacer (solo en memoria)
+        self._indexar()
+
+    # --- disco ---
+    def _indexar(self):
+        if not os.path.isdir(self.carpeta):
+            return
+        inicios = sorted(int(n[4:-4]) for n in os.listdir(self.carpeta)
+                         if n.startswith('seg_') and n.endswith('.bin'))
+        for i, inicio in enumerate(inicios):
+            seg = _Segmento(inicio, self._ruta(inicio))
+            seg.bytes_disco = os.path.getsize(seg.ruta)
+            # El final de un segmento antiguo es el inicio del siguiente menos uno
+            seg.fin = inicios[i + 1] - 1 if i + 1 < len(inicios) else inicio
+            self._segmentos[inicio] = seg
+        while inicios:
+            ultimo = self._segmentos[inicios[-1]]
+            if ultimo.cargar():
+                self._en_memoria[ultimo.inicio] = None
+                self.actual = ultimo.fin
+                break
+            # Segmento vacío (caída justo al crearlo)
+            del self._segmentos[inicios.pop()]
+            os.remove(ultimo.ruta)
+
+    def _ruta(self, inicio):
+        return os.path.join(self.carpeta, f'seg_{inicio:08d}.bin')
+
+    def _anadir(self, version, padre, tipo, instante, datos):
+        if tipo == CLAVE:
+            seg = _Segmento(version, self._ruta(version))
+            seg.registros = []
+            self._segmentos[version] = seg
+        else:
+            seg = next(reversed(self._segmentos.values()))
+        os.makedirs(self.carpeta, exist_ok=True)
+        with open(seg.ruta, 'ab') as f:
+            f.write(_CABECERA.pack(version, padre, tipo, instante, len(datos)) + datos)
+        seg.registros.append((version, padre, tipo, instante, datos))
+        seg.fin = version
+        seg.bytes_disco += _CABECERA.size + len(datos)
+        self._usar(seg)
+        self._recortar()
+
+    def _usar(self, seg):
+        self._en_memoria[seg.inicio] = None
+        self._en_memoria.move_to_end(seg.inicio)
+
+    def _recortar(self):
+        """Aplica los presupuestos. El segmento en curso nunca se toca."""
+        ultimo = next(reversed(self._segmentos))
+        while len(self._segmentos) > 1 and self.bytes_disco() > self.disco:
+            inicio, seg = next(iter(self._segmentos.items()))
+            del self._segmentos[inicio]
+            self._en_memoria.pop(inicio, None)
+            os.remove(seg.ruta)
+        for inicio in list(self._en_memoria):
+            if self.bytes_memoria() <= self.memoria:
+                break
+            if inicio != ultimo:
+                self._segmentos[inicio].registros = None
+                del self._en_memoria[inicio]
+
+    # --- API ---
+    def registrar(self, state):
+        """Apunta `state` (JSON de Fabric en texto) como versión nueva y devuelve su número."""
+        with self._lock:
+            partes = _descomponer(state)
+            version = (self.ultima() or 0) + 1
+            tipo, datos = CLAVE, state.encode('utf-8')
+            if partes is not None:
+                meta, objetos = partes
+                huellas = [_huella(o) for o in objetos]
+                # Delta solo si seguimos sobre la última versión (tras deshacer
+                # toca fotograma clave) y el segmento no ha llegado al límite
+                seg = next(reversed(self._segmentos.values()), None)
+                if (self._huellas is not None and seg is not None and self.actual == self.ultima()
+                        and version - seg.inicio < self.cada_clave):
+                    comunes = 0
+                    for a, b in zip(self._huellas, huellas):
+                        if a != b:
+                            break
+                        comunes += 1
+                    delta = {'k': comunes, 'nuevos': objetos[comunes:]}
+                    if meta != self._meta:
+                        delta['meta'] = meta
+                    tipo, datos = DELTA, json.dumps(delta, separators=(',', ':')).encode('utf-8')
+                self._meta, self._huellas = meta, huellas
+            else:
+                self._meta = self._huellas = None
+            self._anadir(version, self.actual or 0, tipo, time.time(), zlib.compress(datos, NIVEL_ZLIB))
+            self.actual = version
+            self._rehacer.clear()
+            return version
+
+    def _registros(self, version):
+        inicios = list(self._segmentos)
+        i = bisect_right(inicios, version) - 1
+        if i < 0:
+            return None
+        seg = self._segmentos[inicios[i]]
+        if version > seg.fin:
+            return None
+        registros = seg.registros if seg.registros is not None else seg.cargar()
+        self._usar(seg)
+        self._recortar()
+        return [r for r in registros if r[0] <= version]
+
+    def estado(self, version):
+        """(state, instante) de `version`, o None si ya no está en el historial."""
+        with self._lock:
+            registros = self._registros(version)
+            if not registros:
+                return None
+            texto = zlib.decompress(registros[0][4]).decode('utf-8')
+            if len(registros) == 1:
+                return texto, registros[0][3]
+            meta, objetos = _descomponer(texto)
+            for *_, datos in registros[1:]:
+                delta = json.loads(zlib.decompress(datos))
+                objetos = objetos[:delta['k']] + delta['nuevos']
+                meta = delta.get('meta', meta)
+            return json.dumps(dict(meta, objects=objetos), separators=(',', ':')), registros[-1][3]
+
+    def _situar(self, version):
+        resultado = self.estado(version)
+        if resultado is None:
+            return None
+        self.actual = version
+        partes = _descomponer(resultado[0])
+        if partes is None:
+            self._meta = self._huellas = None
+        else:
+            self._meta, objetos = partes
+            self._huellas = [_huella(o) for o in objetos]
+        return resultado[0]
+
+    def ir_a(self, version):
+        """Marca `version` como la actual y devuelve su state. Los siguientes
+        guardados parten de ella; las versiones posteriores no se pierden."""
+        with self._lock:
+            state = self._situar(version)
+            if state is not None:
+                self._rehacer.clear()
+            return state
+
+    def padre(self, version):
+        """Versión de la que partió `version` (0 si es la primera), o None si ya no está."""
+        with self._lock:
+            registros = self._registros(version)
+            return registros[-1][1] if registros else None
+
+    def deshacer(self):
+        """Vuelve a la versión de la que partió la actual. Devuelve (versión, state) o None."""
+        with self._lock:
+            deshecha = self.actual
+            padre = self.padre(deshecha) if deshecha else None
+            state = self._situar(padre) if padre else None
+            if state is None:
+                return None
+            self._rehacer.append(deshecha)
+            return padre, state
+
+    def rehacer(self):
+        """Deshace el último deshacer. Devuelve (versión, state) o None."""
+        with self._lock:
+            while self._rehacer:
+                version = self._rehacer.pop()
+                state = self._situar(version)
+                if state is not None:
+                    return version, state
+            return None
+
+    def primera(self):
+        return next(iter(self._segmentos), None)
+
+    def ultima(self):
+        return next(reversed(self._segmentos.values())).fin if self._segmentos else None
+
+    def bytes_memoria(self):
+        return sum(self._segmentos[i].bytes_memoria for i in self._en_memoria)
+
+    def bytes_disco(self):
+        return sum(s.bytes_disco for s in self._segmentos.values())
+
+    def resumen(self):
+        with self._lock:
+            return {'primera': self.primera(), 'ultima': self.ultima(), 'actual': self.actual,
+                    'cada_clave': self.cada_clave, 'segmentos': len(self._segmentos),
+                    'bytes_memoria': self.bytes_memoria(), 'bytes_disco': self.bytes_disco(),
+                    'presupuesto_memoria': self.memoria, 'presupuesto_disco': self.disco}
+
+# ========== MEDICIÓN ==========
+def _trazo(rng, ancho=1920, alto=1080, puntos=120):
+    """Un trazo a mano alzada como lo serializa Fabric 5."""
+    x, y = rng.uniform(0, ancho), rng.uniform(0, alto)
+    ruta = [['M', round(x, 3), round(y, 3)]]
+    for _ in range(puntos):
+        nx, ny = x + rng.uniform(-8, 8), y + rng.uniform(-8, 8)
+        ruta.append(['Q', round(x, 3), round(y, 3), round((x + nx) / 2, 3), round((y + ny) / 2, 3)])
+        x, y = nx, ny
+    ruta.append(['L', round(x, 3), round(y, 3)])
+    return {'type': 'path', 'version': '5.3.0', 'originX': 'left', 'originY': 'top',
+            'left': round(x, 3), 'top': round(y, 3), 'width': 120.5, 'height': 98.25,
+            'fill': None, 'stroke': rng.choice(['#000000', '#d32f2f', '#1976d2']),
+            'strokeWidth': rng.randint(1, 20), 'strokeDashArray': None, 'strokeLineCap': 'round',
+            'strokeDashOffset': 0, 'strokeLineJoin': 'round', 'strokeUniform': False,
+            'strokeMiterLimit': 10, 'scaleX': 1, 'scaleY': 1, 'angle': 0, 'flipX': False,
+            'flipY': False, 'opacity': 1, 'shadow': None, 'visible': True,
+            'backgroundColor': '', 'fillRule': 'nonzero', 'paintFirst': 'fill',
+            'globalCompositeOperation': 'source-over', 'skewX': 0, 'skewY': 0, 'path': ruta}
+
+def memoria_retenida(historial):
+    """Bytes que ocupan en memoria los segmentos cargados y las huellas de la versión actual."""
+    total = 0
+    for inicio in historial._en_memoria:
+        registros = historial._segmentos[inicio].registros
+        total += sys.getsizeof(registros)
+        for registro in registros:
+            total += sys.getsizeof(registro) + sum(sys.getsizeof(campo) for campo in registro)
+    if historial._huellas is not None:
+        total += sys.getsizeof(historial._huellas) + sum(sys.getsizeof(h) for h in historial._huellas)
+    return total
+
+def medir(trazos_base=300, versiones=150, cada_clave=CADA_CLAVE):
+    """Simula una partida sobre un mapa ya cargado y mide el historial."""
+    rng = random.Random(7)
+    objetos = [_trazo(rng) for _ in range(trazos_base)]
+    carpeta = tempfile.mkdtemp(prefix='historial_pizarra_')
+    try:
+        historial = HistorialPizarra(carpeta, cada_clave=cada_clave, memoria=1 << 40, disco=1 << 40)
+        bytes_planos = 0
+        segundos = 0.0
+        for n in range(versiones):
+            if n % 50 == 49:
+                objetos.pop(rng.randrange(len(objetos)))  # borrar un trazo suelto
+            else:
+                objetos.append(_trazo(rng))  # el caso típico: un trazo más
+            state = json.dumps({'version': '5.3.0', 'objects': objetos, 'background': 'white'})
+            bytes_planos += len(state)
+            inicio = time.perf_counter()
+            historial.registrar(state)
+            segundos += time.perf_counter() - inicio
+
+        tiempos = []
+        for version in rng.sample(range(1, versiones + 1), min(50, versiones)):
+            t = time.perf_counter()
+            historial.estado(version)
+            tiempos.append((time.perf_counter() - t) * 1000)
+        tiempos.sort()
+        print(f"Mapa final: {len(objetos)} trazos, {len(state) / 1e6:.2f} MB de JSON")
+        print(f"{versiones} versiones, fotograma clave cada {cada_clave}")
+        print(f"  copia completa por versión: {bytes_planos / versiones / 1024:10.1f} KB/versión")
+        print(f"  historial en disco:         {historial.bytes_disco() / versiones / 1024:10.1f} KB/versión")
+        print(f"  historial en memoria:       {memoria_retenida(historial) / versiones / 1024:10.1f} KB/versión")
+        print(f"  guardar una versión:        {segundos * 1000 / versiones:10.1f} ms")
+        print(f"  ir a una versión:           {tiempos[len(tiempos) // 2]:10.1f} ms mediana, "
+              f"{tiempos[-1]:.1f} ms peor")
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Historial comprimido de la pizarra')
+    parser.add_argument('--medir', action='store_true', help='medir memoria y tiempos con un mapa cargado')
+    parser.add_argument('--trazos', type=int, default=300, help='trazos del mapa inicial')
+    parser.add_argument('--versiones', type=int, default=150)
+    parser.add_argument('--cada-clave', type=int, default=CADA_CLAVE)
+    args = parser.parse_args()
+    if args.medir:
+        medir(args.trazos, args.versiones, args.cada_clave)
+    else:
+        parser.print_help()
+
+if __name__ == '__main__':
+    main()
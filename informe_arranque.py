@@ -0,0 +1,106 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Informe de arranque: tiempos de importación estilo `python -X importtime`
+# más lo que tarda app.inicializar() (carpetas, JSON de estado, BD) y el
+# calentamiento del grimorio, que ahora va en un hilo de fondo. Compara el
+# arranque actual de app.py (imports perezosos) con cargarlo todo al
+# importar, como se hacía antes.
+#
+# Cada pasada corre en una carpeta temporal con una copia de rpg.db y los
+# grimorios enlazados, así que no migra la BD del repo ni deja archivos.
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+GRIMORIOS = ('monsters', 'spells', 'rules')
+
+# Lo que sigue a los imports de cada escenario: cronometra inicializar() y
+# espera al hilo de calentamiento para medirlo también
+_MEDIR_INIT = """
+import sys, threading, time
+print('--- inicializar ---', file=sys.stderr, flush=True)
+_t = time.perf_counter()
+app.inicializar()
+print('INIT_US', int((time.perf_counter() - _t) * 1e6))
+_t = time.perf_counter()
+for _h in threading.enumerate():
+    if _h.name == 'calentar-grimorio':
+        _h.join()
+print('CALENTAR_US', int((time.perf_counter() - _t) * 1e6))
+"""
+
+ESCENARIOS = {
+    "arranque actual": "import app" + _MEDIR_INIT,
+    "carga completa (antes)": "import frontmatter, markdown, app" + _MEDIR_INIT,
+}
+
+PATRON = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def _carpeta_temporal():
+    """Carpeta de trabajo desechable con lo que inicializar() necesita leer."""
+    carpeta = tempfile.mkdtemp(prefix='informe_arranque_')
+    for nombre in GRIMORIOS:
+        origen = os.path.join(DIRECTORIO_APP, nombre)
+        if os.path.isdir(origen):
+            try:
+                os.symlink(origen, os.path.join(carpeta, nombre), target_is_directory=True)
+            except OSError:
+                shutil.copytree(origen, os.path.join(carpeta, nombre))
+    bd = os.path.join(DIRECTORIO_APP, 'rpg.db')
+    if os.path.exists(bd):
+        shutil.copy2(bd, carpeta)  # la migración se mide sobre una copia
+    return carpeta
+
+def medir(codigo):
+    """Ejecuta `codigo` con -X importtime. Devuelve ([(modulo, acumulado_us)], init_us, calentar_us)."""
+    carpeta = _carpeta_temporal()
+    entorno = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        p for p in (DIRECTORIO_APP, os.environ.get('PYTHONPATH')) if p))
+    try:
+        r = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo],
+                           capture_output=True, text=True, cwd=carpeta, env=entorno)
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+    if r.returncode != 0:
+        print(r.stderr)
+        raise SystemExit(f"Error ejecutando: {codigo}")
+    modulos = []
+    # Lo que se importa dentro de inicializar() ya cuenta en su cronómetro
+    previo = r.stderr.split('--- inicializar ---')[0]
+    for linea in previo.splitlines():
+        m = PATRON.match(linea)
+        # Solo los imports de primer nivel (sin sangría) suman al total
+        if m and len(m.group(3)) == 1:
+            modulos.append((m.group(4), int(m.group(2))))
+    marcas = {}
+    for linea in r.stdout.splitlines():
+        partes = linea.split()
+        if len(partes) == 2 and partes[0] in ('INIT_US', 'CALENTAR_US'):
+            marcas[partes[0]] = partes[1]
+    return modulos, int(marcas['INIT_US']), int(marcas['CALENTAR_US'])
+
+def informe(top=8, repeticiones=3):
+    totales = {}
+    for nombre, codigo in ESCENARIOS.items():
+        # Nos quedamos con la mejor de varias pasadas para quitar ruido de disco
+        mejor, init_us, calentar_us = min((medir(codigo) for _ in range(repeticiones)),
+                                          key=lambda r: sum(us for _, us in r[0]) + r[1])
+        imports = sum(us for _, us in mejor)
+        totales[nombre] = imports + init_us
+        print(f"\n⏱️  {nombre}: {(imports + init_us) / 1000:.1f} ms hasta poder servir")
+        print(f"    imports:         {imports / 1000:8.1f} ms")
+        print(f"    inicializar():   {init_us / 1000:8.1f} ms")
+        print(f"    calentamiento:   {calentar_us / 1000:8.1f} ms (hilo de fondo, no bloquea)")
+        for modulo, us in sorted(mejor, key=lambda x: -x[1])[:top]:
+            print(f"    {us / 1000:8.1f} ms  {modulo}")
+
+    actual, antes = totales.values()
+    diferencia = antes - actual
+    print(f"\n🚀 Arranque actual frente a antes: {abs(diferencia) / 1000:.1f} ms "
+          f"{'menos' if diferencia >= 0 else 'más'} ({100 * abs(diferencia) / antes:.0f}%)")
+
+if __name__ == "__main__":
+    informe()
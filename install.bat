@@ -23,7 +23,8 @@ call venv\Scripts\activate
 
 echo [2/2] Instalando librerias...
 python -m pip install --upgrade pip
-pip install Flask==2.3.3 Werkzeug==2.3.7 python-frontmatter markdown requests deep-translator
+pip install Flask==2.3.3 Werkzeug==2.3.7 python-frontmatter markdown requests deep-translator numpy brotli
+python precomprimir.py
 
 echo ============================================
 echo   INSTALACION COMPLETADA
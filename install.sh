@@ -8,7 +8,10 @@ source venv/bin/activate
 # Instalar librerías
 pip install --upgrade pip
 pip install -r requirements.txt
-pip install Flask Werkzeug python-frontmatter markdown requests deep-translator
+pip install Flask Werkzeug python-frontmatter markdown requests deep-translator numpy brotli
+
+# Precomprimir estáticos (.gz/.br)
+python3 precomprimir.py
 
 # Dar permiso al lanzador
 chmod +x run.sh
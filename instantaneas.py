@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import unquote
+
+# ========== INSTANTÁNEAS DE SESIÓN ==========
+# Guarda y recupera una mesa completa mientras el servidor sigue en marcha:
+#   - la BD con sqlite3.Connection.backup (copia coherente aunque haya
+#     escrituras a la vez),
+#   - el comando de pantalla, la pizarra y la lista de escenas que están en memoria,
+#   - un manifiesto de los medios referenciados (imágenes, vídeos...) por
+#     hash de contenido. Los archivos van a un almacén común
+#     snapshots/media/<sha256>, así que cada vídeo se guarda una sola vez
+#     aunque aparezca en cien instantáneas.
+#
+# Estructura: snapshots/<mesa>/<nombre>/{rpg.db, estado.json}
+
+SNAPSHOTS_DIR = 'snapshots'
+STATIC_DIR = 'static'
+MEDIA_DIR = os.path.join(SNAPSHOTS_DIR, 'media')
+PATRON_NOMBRE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+PATRON_MEDIO = re.compile(r'/static/[^\s"\'\\)<>]+')
+MAX_AUTOMATICAS = 10  # instantáneas automáticas (con prefijo) que se conservan por mesa
+
+class ErrorInstantanea(ValueError):
+    pass
+
+def nombre_valido(nombre):
+    return isinstance(nombre, str) and PATRON_NOMBRE.match(nombre) is not None
+
+# ========== MEDIOS ==========
+_hashes = {}  # ruta -> (mtime_ns, tamaño, sha256): no rehashear vídeos sin cambios
+
+def hash_archivo(ruta):
+    st = os.stat(ruta)
+    cacheado = _hashes.get(ruta)
+    if cacheado and cacheado[:2] == (st.st_mtime_ns, st.st_size):
+        return cacheado[2]
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+    _hashes[ruta] = (st.st_mtime_ns, st.st_size, h.hexdigest())
+    return h.hexdigest()
+
+def ruta_medio(url):
+    """Ruta local de una URL /static/..., o None si se saldría de static/ ('..', enlaces)."""
+    if not url.startswith('/static/'):
+        return None
+    relativa = unquote(url.split('?', 1)[0].split('#', 1)[0])[len('/static/'):]
+    raiz = os.path.realpath(STATIC_DIR)
+    ruta = os.path.realpath(os.path.join(raiz, relativa))
+    if os.path.commonpath([raiz, ruta]) != raiz or ruta == raiz:
+        return None
+    return ruta
+
+def medios_referenciados(*fuentes):
+    """URLs /static/... que aparecen en los JSON de estado y existen en disco."""
+    urls = set()
+    for fuente in fuentes:
+        urls.update(PATRON_MEDIO.findall(json.dumps(fuente)))
+    return sorted(u for u in urls if ruta_medio(u) and os.path.isfile(ruta_medio(u)))
+
+def _guardar_en_almacen(ruta, sha):
+    destino = os.path.join(MEDIA_DIR, sha)
+    if os.path.exists(destino):
+        return
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+    try:
+        os.link(ruta, destino)  # instantáneo si estamos en el mismo disco
+    except OSError:
+        shutil.copy2(ruta, destino)
+
+# ========== INSTANTÁNEA Y RESTAURACIÓN ==========
+def _carpeta(mesa, nombre):
+    if not nombre_valido(nombre):
+        raise ErrorInstantanea(f'Nombre de instantánea no válido: {nombre}')
+    return os.path.join(SNAPSHOTS_DIR, mesa, nombre)
+
+def _reservar(mesa, nombre, prefijo):
+    """Crea la carpeta de la instantánea y devuelve (nombre, carpeta).
+
+    Un nombre explícito que ya existe es un error; los automáticos
+    (fecha, con `prefijo` delante si lo hay) añaden -2, -3... hasta ser únicos.
+    """
+    if nombre:
+        carpeta = _carpeta(mesa, nombre)
+        os.makedirs(os.path.dirname(carpeta), exist_ok=True)
+        try:
+            os.mkdir(carpeta)
+        except FileExistsError:
+            raise ErrorInstantanea(f'Ya existe una instantánea llamada {nombre}')
+        return nombre, carpeta
+    base = datetime.now().strftime('%Y%m%d-%H%M%S')
+    if prefijo:
+        base = f'{prefijo}-{base}'
+    for n in range(1, 1000):
+        nombre = base if n == 1 else f'{base}-{n}'
+        carpeta = _carpeta(mesa, nombre)
+        os.makedirs(os.path.dirname(carpeta), exist_ok=True)
+        try:
+            os.mkdir(carpeta)
+            return nombre, carpeta
+        except FileExistsError:
+            continue
+    raise ErrorInstantanea(f'No se pudo elegir un nombre libre para {base}')
+
+def _guardar_medios(carpeta, manifiesto):
+    """Hashea los medios, los lleva al almacén y escribe estado.json.
+
+    estado.json se escribe lo último y de forma atómica: hasta entonces la
+    instantánea no aparece en listar() ni se puede restaurar.
+    """
+    medios = []
+    for url in medios_referenciados(manifiesto['screen_command'], manifiesto['whiteboard'], manifiesto['escenas']):
+        ruta = ruta_medio(url)
+        sha = hash_archivo(ruta)
+        _guardar_en_almacen(ruta, sha)
+        medios.append({'url': url, 'sha256': sha, 'bytes': os.path.getsize(ruta)})
+    manifiesto['medios'] = medios
+    ruta_estado = os.path.join(carpeta, 'estado.json')
+    with open(ruta_estado + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f)
+    os.replace(ruta_estado + '.tmp', ruta_estado)
+
+def _medios_en_segundo_plano(carpeta, manifiesto, prefijo):
+    try:
+        _guardar_medios(carpeta, manifiesto)
+    except OSError as e:
+        print(f"⚠️ Instantánea {manifiesto['nombre']} incompleta, se descarta: {e}")
+        shutil.rmtree(carpeta, ignore_errors=True)
+        return
+    if prefijo:
+        podar(manifiesto['mesa'], prefijo)
+
+def crear(db_path, mesa, estado_mesa, nombre=None, prefijo=None, medios_en_segundo_plano=False):
+    """Hace una instantánea de `mesa` y devuelve su manifiesto.
+
+    Sin `nombre` se usa la fecha (con `prefijo` delante), siempre sin pisar otra;
+    de las automáticas con `prefijo` solo se conservan las MAX_AUTOMATICAS últimas.
+    Con `medios_en_segundo_plano` la BD y el estado se copian ya, pero el hash
+    de los medios (lento con vídeos que no están en caché) va en un hilo, y el
+    manifiesto devuelto trae 'medios': None.
+    """
+    inicio = time.perf_counter()
+    nombre, carpeta = _reservar(mesa, nombre, prefijo)
+    try:
+        # Copia en caliente de la BD
+        origen = sqlite3.connect(db_path)
+        destino = sqlite3.connect(os.path.join(carpeta, 'rpg.db'))
+        try:
+            origen.backup(destino)
+        finally:
+            destino.close()
+            origen.close()
+
+        with estado_mesa.lock:
+            comando, pizarra, lista_escenas = estado_mesa.comando, estado_mesa.pizarra, estado_mesa.escenas
+        manifiesto = {
+            'nombre': nombre,
+            'mesa': mesa,
+            'creada': datetime.now().isoformat(),
+            'screen_command': comando,
+            'whiteboard': pizarra,
+            'escenas': lista_escenas,
+            'medios': None,
+        }
+        if medios_en_segundo_plano:
+            threading.Thread(target=_medios_en_segundo_plano, args=(carpeta, dict(manifiesto), prefijo),
+                             name=f'instantanea-{nombre}', daemon=True).start()
+        else:
+            _guardar_medios(carpeta, manifiesto)
+    except BaseException:
+        shutil.rmtree(carpeta, ignore_errors=True)  # sin carpetas a medias
+        raise
+    if prefijo and not medios_en_segundo_plano:
+        podar(mesa, prefijo)
+    manifiesto['ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    return manifiesto
+
+def podar(mesa, prefijo, conservar=MAX_AUTOMATICAS):
+    """Borra las instantáneas `prefijo`-* de `mesa` salvo las `conservar` más recientes.
+
+    Solo cuenta las completas (con estado.json), así que nunca borra una que
+    se esté terminando en segundo plano. El almacén de medios no se toca: lo
+    comparten todas las instantáneas y cada archivo está una sola vez.
+    """
+    automaticas = [s for s in listar(mesa) if s['nombre'].startswith(f'{prefijo}-')]
+    for sobrante in automaticas[conservar:]:
+        shutil.rmtree(_carpeta(mesa, sobrante['nombre']), ignore_errors=True)
+    return len(automaticas[conservar:])
+
+def restaurar(db_path, mesa, estado_mesa, nombre):
+    """Devuelve `mesa` al estado de la instantánea `nombre`. Las demás mesas no se tocan."""
+    inicio = time.perf_counter()
+    carpeta = _carpeta(mesa, nombre)
+    ruta_db = os.path.join(carpeta, 'rpg.db')
+    ruta_estado = os.path.join(carpeta, 'estado.json')
+    if not (os.path.exists(ruta_db) and os.path.exists(ruta_estado)):
+        raise ErrorInstantanea(f'No existe la instantánea {nombre}')
+    with open(ruta_estado, 'r', encoding='utf-8') as f:
+        manifiesto = json.load(f)
+
+    # Sustituimos solo las filas de esta mesa, en una transacción
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('ATTACH DATABASE ? AS snap', (ruta_db,))
+        with conn:
+            conn.execute('DELETE FROM characters WHERE mesa = ?', (mesa,))
+            conn.execute('DELETE FROM game_state WHERE mesa = ?', (mesa,))
+            conn.execute('''INSERT INTO characters (id, name, initiative, hp, max_hp, type, is_active, monster_slug, mesa, created_at)
+                            SELECT id, name, initiative, hp, max_hp, type, is_active, monster_slug, mesa, created_at
+                            FROM snap.characters WHERE mesa = ?''', (mesa,))
+            conn.execute('''INSERT INTO game_state (id, current_turn, round_number, mesa, last_updated)
+                            SELECT id, current_turn, round_number, mesa, last_updated
+                            FROM snap.game_state WHERE mesa = ?''', (mesa,))
+        conn.execute('DETACH DATABASE snap')
+    finally:
+        conn.close()
+
+    # Medios que falten (p.ej. borrados después de la instantánea)
+    recuperados = 0
+    for medio in manifiesto.get('medios', []):
+        ruta = ruta_medio(medio['url'])
+        almacen = os.path.join(MEDIA_DIR, os.path.basename(medio['sha256']))
+        if ruta and not os.path.exists(ruta) and os.path.exists(almacen):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            shutil.copy2(almacen, ruta)
+            recuperados += 1
+
+    # Estado en memoria; el comando se reemite con fecha nueva para que las
+    # pantallas lo vuelvan a ejecutar
+    comando = manifiesto.get('screen_command') or {}
+    estado_mesa.guardar_pizarra((manifiesto.get('whiteboard') or {}).get('state'))
+    if 'escenas' in manifiesto:  # las instantáneas anteriores a la lista de escenas no la traen
+        estado_mesa.guardar_escenas(manifiesto['escenas']['escenas'], manifiesto['escenas']['actual'])
+    estado_mesa.guardar_comando(comando.get('type', 'initiative'), comando.get('data'))
+    return {'nombre': nombre, 'medios_recuperados': recuperados,
+            'ms': round((time.perf_counter() - inicio) * 1000, 2)}
+
+def listar(mesa):
+    """Instantáneas de `mesa`, de la más reciente a la más antigua."""
+    carpeta = os.path.join(SNAPSHOTS_DIR, mesa)
+    if not os.path.isdir(carpeta):
+        return []
+    lista = []
+    for nombre in os.listdir(carpeta):
+        ruta_estado = os.path.join(carpeta, nombre, 'estado.json')
+        if os.path.isfile(ruta_estado):
+            with open(ruta_estado, 'r', encoding='utf-8') as f:
+                manifiesto = json.load(f)
+            lista.append({'nombre': nombre, 'creada': manifiesto.get('creada'),
+                          'medios': len(manifiesto.get('medios', []))})
+    return sorted(lista, key=lambda s: s['creada'] or '', reverse=True)
@@ -200,7 +200,7 @@ function initWhiteboard() {
         if (isDrawingShape) { isDrawingShape = false; activeShape.setCoords(); saveWhiteboardState(); activeShape = null; }
     });
 
-    fetch('/api/whiteboard/load').then(r => r.json()).then(data => { if(data.state) masterCanvas.loadFromJSON(data.state, masterCanvas.renderAll.bind(masterCanvas)); });
+    fetch(MESA_BASE + '/api/whiteboard/load').then(r => r.json()).then(data => { if(data.state) masterCanvas.loadFromJSON(data.state, masterCanvas.renderAll.bind(masterCanvas)); });
     
     window.addEventListener('resize', () => {
         if(!document.getElementById('whiteboard-wrapper').classList.contains('wb-fullscreen') && masterCanvas){
@@ -304,7 +304,7 @@ function updateStatus(msg, err=false) {
 async function fetchData(url, method='GET', data=null) {
     const opts = { method: method, headers: { 'Content-Type': 'application/json' } };
     if (data) opts.body = JSON.stringify(data);
-    try { const r = await fetch(url, opts); return await r.json(); } catch (e) { console.error(e); return null; }
+    try { const r = await fetch(MESA_BASE + url, opts); return await r.json(); } catch (e) { console.error(e); return null; }
 }
 async function saveScreenCommand(type, data={}) { return fetchData('/api/screen/command', 'POST', { type, data }); }
 
@@ -406,7 +406,7 @@ async function showContentDetail(type, slug) {
     const c = document.getElementById('monsterDetailContent');
     if(c) c.innerHTML = '<div class="loading">Cargando...</div>'; 
     showModal();
-    const r = await fetch(`/content/${type}/${slug}`);
+    const r = await fetch(`${MESA_BASE}/content/${type}/${slug}`);
     if(c) c.innerHTML = await r.text();
     
     if (type === 'monster') currentContentData = grimoireMonsters.find(m => m.slug === slug);
@@ -440,7 +440,7 @@ function openFilePicker(t) {
 async function uploadMedia(f, t) { 
     if(!f) return; 
     const fd = new FormData(); fd.append('file', f); 
-    const r = await(await fetch('/api/media/upload', {method:'POST', body:fd})).json(); 
+    const r = await(await fetch(MESA_BASE + '/api/media/upload', {method:'POST', body:fd})).json(); 
     if(r.success) { 
         if(t==='image') { currentImage = r.url; updateStatus('Imagen lista'); }
         else { currentVideo = r.url; updateStatus('Video listo'); }
@@ -473,7 +473,7 @@ function getMasterAudio() {
 async function loadAudioList() {
     try {
         console.log("Cargando lista de audios...");
-        const response = await fetch('/api/audio/list');
+        const response = await fetch(MESA_BASE + '/api/audio/list');
         const files = await response.json();
         const select = document.getElementById('audioList');
         
@@ -588,7 +588,7 @@ async function uploadAudio(file) {
     
     updateStatus('Subiendo audio...');
     try {
-        const r = await (await fetch('/api/media/upload?type=audio', { method:'POST', body:fd })).json(); 
+        const r = await (await fetch(MESA_BASE + '/api/media/upload?type=audio', { method:'POST', body:fd })).json(); 
         if(r.success) { 
             updateStatus('Audio subido con éxito');
             await loadAudioList(); // Esperamos a que recargue la lista
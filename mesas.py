@@ -0,0 +1,165 @@
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime
+
+from escenas import EstadoPrecarga
+from historial_pizarra import HistorialPizarra
+from metricas import cronometro
+
+# ========== ESTADO POR MESA ==========
+# Cada mesa (partida) tiene su propio comando de pantalla y su pizarra en
+# memoria. Los jugadores hacen polling cada segundo, así que las lecturas no
+# tocan disco; las escrituras se guardan también en JSON para sobrevivir a un
+# reinicio. Las mesas que llevan un rato sin actividad se sacan de memoria y
+# se recargan del disco la próxima vez que alguien las pida.
+
+MESA_POR_DEFECTO = 'principal'
+MESAS_DIR = 'mesas'
+PATRON_MESA = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+
+def mesa_valida(mesa):
+    return bool(mesa) and PATRON_MESA.match(mesa) is not None
+
+def _leer_json(ruta, por_defecto):
+    try:
+        with cronometro('state_read'), open(ruta, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return por_defecto
+
+def _escribir_json(ruta, datos):
+    carpeta = os.path.dirname(ruta)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    # Escribimos a un temporal y renombramos para no dejar JSON a medias
+    tmp = ruta + '.tmp'
+    with cronometro('state_write'):
+        with open(tmp, 'w') as f:
+            json.dump(datos, f)
+        os.replace(tmp, ruta)
+
+class EstadoMesa:
+    """Comando de pantalla y pizarra de una mesa, en memoria."""
+
+    def __init__(self, mesa):
+        self.mesa = mesa
+        self.lock = threading.Lock()
+        self.ultimo_acceso = time.monotonic()
+        if mesa == MESA_POR_DEFECTO:
+            # Rutas históricas, para no perder el estado de instalaciones previas
+            self.ruta_comando = 'screen_command.json'
+            self.ruta_pizarra = 'whiteboard_state.json'
+        else:
+            self.ruta_comando = os.path.join(MESAS_DIR, mesa, 'screen_command.json')
+            self.ruta_pizarra = os.path.join(MESAS_DIR, mesa, 'whiteboard_state.json')
+        # La lista de escenas es nueva: va en mesas/<mesa>/ también para la principal
+        self.ruta_escenas = os.path.join(MESAS_DIR, mesa, 'escenas.json')
+        ahora = datetime.now().isoformat()
+        self.comando = _leer_json(self.ruta_comando, {'type': 'initiative', 'data': None, 'timestamp': ahora})
+        self.pizarra = _leer_json(self.ruta_pizarra, {'state': None, 'timestamp': ahora})
+        self.escenas = _leer_json(self.ruta_escenas, {'escenas': [], 'actual': -1, 'timestamp': ahora})
+        self.precarga = EstadoPrecarga()
+        # /api/whiteboard/load ya serializado y comprimido: codificación -> (timestamp, cuerpo, bytes)
+        self.cache_pizarra = {}
+        self.historial = HistorialPizarra(os.path.join(MESAS_DIR, mesa, 'pizarra_historial'))
+        version = self.pizarra.get('version')
+        if self.historial.actual is None and self.pizarra.get('state'):
+            # Pizarra de antes de tener historial: será la versión 1
+            self.pizarra['version'] = self.historial.registrar(self.pizarra['state'])
+        elif version and version != self.historial.actual:
+            # Se cerró con una versión deshecha en pantalla: seguimos desde ella
+            self.historial.ir_a(version)
+
+    def guardar_comando(self, command_type, data=None):
+        command = {
+            'type': command_type,
+            'data': data,
+            'timestamp': datetime.now().isoformat()
+        }
+        with self.lock:
+            self.comando = command
+            _escribir_json(self.ruta_comando, command)
+        return command
+
+    def guardar_pizarra(self, state_data, version=None):
+        """Guarda la pizarra como versión nueva del historial, o como `version`
+        si venimos de deshacer o de saltar a una versión anterior."""
+        with self.lock:
+            if version is None and state_data:
+                version = self.historial.registrar(state_data)
+            state = {
+                'state': state_data,
+                'timestamp': datetime.now().isoformat(),
+                'version': version
+            }
+            self.pizarra = state
+            _escribir_json(self.ruta_pizarra, state)
+        return state
+
+    def ir_a_version(self, version):
+        """Pone en la pizarra una versión del historial. None si ya no existe."""
+        state_data = self.historial.ir_a(version)
+        if state_data is None:
+            return None
+        return self.guardar_pizarra(state_data, version)
+
+    def deshacer_pizarra(self):
+        resultado = self.historial.deshacer()
+        return None if resultado is None else self.guardar_pizarra(resultado[1], resultado[0])
+
+    def rehacer_pizarra(self):
+        resultado = self.historial.rehacer()
+        return None if resultado is None else self.guardar_pizarra(resultado[1], resultado[0])
+
+    def guardar_escenas(self, lista, actual=None):
+        """Sustituye la lista de escenas. El timestamp avisa a las pantallas de que precarguen."""
+        with self.lock:
+            if actual is None:
+                actual = self.escenas['actual']
+            self.escenas = {
+                'escenas': lista,
+                'actual': min(actual, len(lista) - 1),
+                'timestamp': datetime.now().isoformat()
+            }
+            _escribir_json(self.ruta_escenas, self.escenas)
+        return self.escenas
+
+class RegistroMesas:
+    """Mesas activas en memoria con expulsión por inactividad."""
+
+    def __init__(self, inactividad=30 * 60, intervalo_limpieza=60):
+        self.inactividad = inactividad
+        self.intervalo_limpieza = intervalo_limpieza
+        self._mesas = {}
+        self._lock = threading.Lock()
+        self._ultima_limpieza = time.monotonic()
+
+    def obtener(self, mesa):
+        ahora = time.monotonic()
+        estado = self._mesas.get(mesa)
+        if estado is None:
+            with self._lock:
+                estado = self._mesas.get(mesa)
+                if estado is None:
+                    estado = EstadoMesa(mesa)
+                    self._mesas[mesa] = estado
+        estado.ultimo_acceso = ahora
+        if ahora - self._ultima_limpieza > self.intervalo_limpieza:
+            self.expulsar_inactivas(ahora)
+        return estado
+
+    def expulsar_inactivas(self, ahora=None):
+        """Saca de memoria las mesas sin actividad. Su estado ya está en disco."""
+        ahora = time.monotonic() if ahora is None else ahora
+        with self._lock:
+            self._ultima_limpieza = ahora
+            inactivas = [m for m, e in self._mesas.items() if ahora - e.ultimo_acceso > self.inactividad]
+            for m in inactivas:
+                del self._mesas[m]
+        return inactivas
+
+    def activas(self):
+        return list(self._mesas)
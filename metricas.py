@@ -0,0 +1,208 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, request
+
+# ========== MÉTRICAS ==========
+# Latencia por ruta, tiempos de SQLite, de parseo de frontmatter/markdown y
+# de los JSON de estado, y pantallas conectadas. Todo se expone en /metrics
+# en formato texto de Prometheus. Opcionalmente:
+#   - log de peticiones lentas: umbral en ms en app.config['METRICAS_LENTAS_MS']
+#     (se lee en cada petición, así que se puede cambiar en caliente) o, si
+#     no está, en la variable de entorno RPG_LENTAS_MS,
+#   - perfilador por muestreo que se enciende y apaga en caliente.
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PANTALLA_ACTIVA_S = 5  # una pantalla cuenta como conectada si hizo polling hace < 5 s
+
+class Histograma:
+    """Histograma de Prometheus (en segundos) con etiquetas."""
+
+    def __init__(self, nombre, ayuda, etiquetas):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, segundos, *valores):
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * len(BUCKETS), 0, 0.0]
+            for i, limite in enumerate(BUCKETS):
+                if segundos <= limite:
+                    serie[0][i] += 1
+            serie[1] += 1
+            serie[2] += segundos
+
+    def exportar(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for valores, (buckets, cuenta, suma) in sorted(series.items()):
+            base = ','.join(f'{e}="{_escapar(v)}"' for e, v in zip(self.etiquetas, valores))
+            sep = ',' if base else ''
+            for limite, n in zip(BUCKETS, buckets):
+                lineas.append(f'{self.nombre}_bucket{{{base}{sep}le="{limite}"}} {n}')
+            lineas.append(f'{self.nombre}_bucket{{{base}{sep}le="+Inf"}} {cuenta}')
+            lineas.append(f'{self.nombre}_sum{{{base}}} {suma:.6f}')
+            lineas.append(f'{self.nombre}_count{{{base}}} {cuenta}')
+        return lineas
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+peticiones = Histograma('rpg_http_request_duration_seconds', 'Latencia de las peticiones HTTP',
+                        ('route', 'method', 'status'))
+operaciones = Histograma('rpg_operation_duration_seconds',
+                         'SQLite, parseo de frontmatter/markdown y E/S de los JSON de estado', ('op',))
+
+@contextmanager
+def cronometro(op):
+    """with cronometro('frontmatter_parse'): ... mide el bloque."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        operaciones.observar(time.perf_counter() - inicio, op)
+
+# ========== SQLITE ==========
+class CursorMedido(sqlite3.Cursor):
+    def execute(self, *args, **kwargs):
+        with cronometro('sqlite_query'):
+            return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        with cronometro('sqlite_query'):
+            return super().executemany(*args, **kwargs)
+
+class ConexionMedida(sqlite3.Connection):
+    """sqlite3.connect(..., factory=ConexionMedida) para medir cada consulta."""
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+# ========== PANTALLAS CONECTADAS ==========
+_pantallas = {}
+_pantallas_lock = threading.Lock()
+
+def anotar_pantalla(mesa):
+    clave = (mesa, request.remote_addr, request.headers.get('User-Agent', ''))
+    with _pantallas_lock:
+        _pantallas[clave] = time.monotonic()
+
+def pantallas_conectadas():
+    """{mesa: nº de pantallas que han hecho polling hace poco}."""
+    limite = time.monotonic() - PANTALLA_ACTIVA_S
+    with _pantallas_lock:
+        for clave in [k for k, t in _pantallas.items() if t < limite]:
+            del _pantallas[clave]
+        return Counter(mesa for mesa, _, _ in _pantallas)
+
+# ========== PERFILADOR POR MUESTREO ==========
+class Perfilador:
+    """Cada `intervalo` segundos apunta la pila de todos los hilos."""
+
+    def __init__(self, intervalo=0.01, profundidad=12):
+        self.intervalo = intervalo
+        self.profundidad = profundidad
+        self.muestras = Counter()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._parar = threading.Event()
+
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self):
+        if self.activo:
+            return
+        with self._lock:
+            self.muestras.clear()
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._bucle, name='perfilador', daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+
+    def _bucle(self):
+        propio = threading.get_ident()
+        while not self._parar.wait(self.intervalo):
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                pila = []
+                while frame is not None and len(pila) < self.profundidad:
+                    code = frame.f_code
+                    pila.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                    frame = frame.f_back
+                with self._lock:
+                    self.muestras[';'.join(reversed(pila))] += 1
+
+    def informe(self, top=30):
+        """Pilas colapsadas (formato flamegraph) de las más muestreadas."""
+        with self._lock:
+            mas_vistas = self.muestras.most_common(top)
+        return '\n'.join(f'{pila} {n}' for pila, n in mas_vistas)
+
+perfilador = Perfilador()
+
+# ========== MIDDLEWARE Y EXPORTACIÓN ==========
+def _inicio_peticion():
+    g._metricas_inicio = time.perf_counter()
+
+def umbral_lentas_ms():
+    """Umbral actual del log de peticiones lentas, en ms, o None si está apagado."""
+    lentas = current_app.config.get('METRICAS_LENTAS_MS')
+    if lentas in (None, ''):
+        return None
+    try:
+        return float(lentas)
+    except (TypeError, ValueError):
+        return None  # un valor inválido puesto en caliente apaga el log, no tumba la petición
+
+def _fin_peticion(response):
+    inicio = g.pop('_metricas_inicio', None)
+    if inicio is None:
+        return response
+    segundos = time.perf_counter() - inicio
+    ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    peticiones.observar(segundos, ruta, request.method, response.status_code)
+    umbral = umbral_lentas_ms()
+    if umbral is not None and segundos * 1000 >= umbral:
+        print(f"🐢 Petición lenta: {request.method} {request.path} {segundos * 1000:.1f} ms")
+    return response
+
+def exportar():
+    lineas = peticiones.exportar() + operaciones.exportar()
+    lineas += ['# HELP rpg_connected_screens Pantallas de jugador haciendo polling',
+               '# TYPE rpg_connected_screens gauge']
+    for mesa, n in sorted(pantallas_conectadas().items()):
+        lineas.append(f'rpg_connected_screens{{mesa="{_escapar(mesa)}"}} {n}')
+    lineas += ['# HELP rpg_profiler_active Perfilador por muestreo encendido',
+               '# TYPE rpg_profiler_active gauge', f'rpg_profiler_active {int(perfilador.activo)}']
+    return '\n'.join(lineas) + '\n'
+
+def registrar(app):
+    """Activa el middleware de métricas en la app Flask."""
+    if app.config.get('METRICAS_LENTAS_MS') is None:
+        app.config['METRICAS_LENTAS_MS'] = os.environ.get('RPG_LENTAS_MS')
+    lentas = app.config['METRICAS_LENTAS_MS']
+    if lentas not in (None, ''):
+        try:
+            float(lentas)
+        except (TypeError, ValueError):
+            print(f"⚠️ Umbral de peticiones lentas no válido ({lentas!r}), se desactiva el log de lentas")
+            app.config['METRICAS_LENTAS_MS'] = None
+    app.before_request(_inicio_peticion)
+    app.after_request(_fin_peticion)
+    if os.environ.get('RPG_PERFILADOR') == '1':
+        perfilador.iniciar()
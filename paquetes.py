@@ -0,0 +1,90 @@
+import os
+import threading
+import zipfile
+
+# ========== PAQUETES DE CONTENIDO (.zip) ==========
+# Los .zip que generan descargar_conjuros.py y generar_reglas.py se pueden
+# usar tal cual, sin descomprimir: se lee el directorio central una vez y
+# cada .md se extrae a memoria solo cuando se pide. Los .md sueltos del
+# directorio siempre tienen prioridad sobre los del paquete.
+
+class PaqueteZip:
+    """Un .zip de contenido montado en solo lectura."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.nombre = os.path.basename(ruta)
+        st = os.stat(ruta)
+        self.firma = (ruta, st.st_mtime_ns, st.st_size)
+        self._zip = zipfile.ZipFile(ruta)
+        # slug -> ZipInfo (nombre, offset y tamaño del miembro). Si dos
+        # miembros comparten nombre en distintas carpetas gana el primero.
+        self.indice = {}
+        for info in self._zip.infolist():
+            base = os.path.basename(info.filename)
+            if not info.is_dir() and base.endswith('.md'):
+                self.indice.setdefault(base[:-3], info)
+
+    def slugs(self):
+        return list(self.indice)
+
+    def leer(self, slug):
+        """Texto del miembro `slug` o None si no está en el paquete."""
+        info = self.indice.get(slug)
+        if info is None:
+            return None
+        return self._zip.read(info).decode('utf-8')
+
+    def cerrar(self):
+        self._zip.close()
+
+_abiertos = {}
+_lock = threading.Lock()
+
+def _rutas_paquetes(directorio, extra=()):
+    rutas = []
+    if os.path.isdir(directorio):
+        rutas = sorted(os.path.join(directorio, f) for f in os.listdir(directorio) if f.endswith('.zip'))
+    return rutas + [r for r in extra if os.path.isfile(r)]
+
+def paquetes_de(directorio, extra=()):
+    """Paquetes montados para `directorio`, en orden de prioridad.
+
+    Son los .zip dentro del propio directorio (orden alfabético) seguidos
+    de las rutas de `extra`. Se reabren solo si el archivo cambia.
+    """
+    paquetes = []
+    for ruta in _rutas_paquetes(directorio, extra):
+        st = os.stat(ruta)
+        firma = (ruta, st.st_mtime_ns, st.st_size)
+        paquete = _abiertos.get(ruta)
+        if paquete is None or paquete.firma != firma:
+            with _lock:
+                paquete = _abiertos.get(ruta)
+                if paquete is None or paquete.firma != firma:
+                    try:
+                        nuevo = PaqueteZip(ruta)
+                    except (OSError, zipfile.BadZipFile) as e:
+                        print(f"Error abriendo paquete {ruta}: {e}")
+                        continue
+                    if paquete is not None:
+                        paquete.cerrar()
+                    _abiertos[ruta] = paquete = nuevo
+        paquetes.append(paquete)
+    return paquetes
+
+def firma_paquetes(directorio, extra=()):
+    """Rutas, mtimes y tamaños de los paquetes, para invalidar cachés."""
+    firmas = []
+    for ruta in _rutas_paquetes(directorio, extra):
+        st = os.stat(ruta)
+        firmas.append((ruta, st.st_mtime_ns, st.st_size))
+    return tuple(firmas)
+
+def leer_de_paquetes(directorio, slug, extra=()):
+    """Texto de `slug` en el primer paquete que lo tenga, o None."""
+    for paquete in paquetes_de(directorio, extra):
+        texto = paquete.leer(slug)
+        if texto is not None:
+            return texto
+    return None
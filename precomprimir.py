@@ -0,0 +1,50 @@
+import os
+import time
+
+from compresion import UMBRAL_BYTES, brotli, comprimir
+
+# Genera hermanos .gz y .br de los estáticos de texto (js, css, svg...) para
+# que el servidor los sirva ya comprimidos. Vuelve a ejecutarlo tras editar
+# static/ (el servidor ignora los .gz/.br más viejos que su original).
+
+DIRECTORIO_STATIC = "static"
+EXTENSIONES = ('.js', '.css', '.html', '.svg', '.json', '.txt', '.md')
+EXCLUIR = (os.path.join(DIRECTORIO_STATIC, 'uploads'),)
+
+def precomprimir(directorio=DIRECTORIO_STATIC):
+    codificaciones = [('gzip', '.gz', 9)]
+    if brotli is not None:
+        codificaciones.append(('br', '.br', 11))
+    else:
+        print("⚠️  brotli no instalado (pip install brotli): solo se generan .gz")
+
+    total_original = total_comprimido = 0
+    for raiz, _, archivos in os.walk(directorio):
+        if raiz.startswith(EXCLUIR):
+            continue
+        for nombre in archivos:
+            if not nombre.endswith(EXTENSIONES):
+                continue
+            ruta = os.path.join(raiz, nombre)
+            with open(ruta, 'rb') as f:
+                datos = f.read()
+            if len(datos) < UMBRAL_BYTES:
+                continue  # No compensa: la cabecera gzip pesa más que lo ahorrado
+            linea = f"{ruta}: {len(datos)} B"
+            for cod, ext, calidad in codificaciones:
+                inicio = time.perf_counter()
+                comprimido = comprimir(datos, cod, calidad)
+                ms = (time.perf_counter() - inicio) * 1000
+                with open(ruta + ext, 'wb') as f:
+                    f.write(comprimido)
+                linea += f" → {ext} {len(comprimido)} B ({ms:.1f} ms)"
+                total_comprimido += len(comprimido) if ext == codificaciones[-1][1] else 0
+            total_original += len(datos)
+            print(linea)
+
+    if total_original:
+        print(f"📦 {total_original} B → {total_comprimido} B "
+              f"({100 * total_comprimido / total_original:.0f}% del tamaño original)")
+
+if __name__ == "__main__":
+    precomprimir()
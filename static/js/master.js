@@ -58,6 +58,12 @@ window.openAudioPicker = openAudioPicker; // Para subir audios
 window.toggleCenterView = toggleCenterView;
 window.loadLocalMarkdown = loadLocalMarkdown;
 window.projectCustomMarkdown = projectCustomMarkdown;
+window.queueScene = queueScene;
+window.undoWhiteboard = undoWhiteboard;
+window.redoWhiteboard = redoWhiteboard;
+window.gotoWhiteboardVersion = gotoWhiteboardVersion;
+window.goToScene = goToScene;
+window.deleteScene = deleteScene;
 
 // ========== INICIALIZACIÓN ==========
 document.addEventListener('DOMContentLoaded', function() {
@@ -67,6 +73,8 @@ document.addEventListener('DOMContentLoaded', function() {
     setupEventListeners();
     if (typeof fabric !== 'undefined') { initWhiteboard(); }
     setInterval(loadGameState, 3000); 
+    loadScenes();
+    setInterval(loadScenes, 2000);
 });
 
 function setupEventListeners() {
@@ -200,7 +208,14 @@ function initWhiteboard() {
         if (isDrawingShape) { isDrawingShape = false; activeShape.setCoords(); saveWhiteboardState(); activeShape = null; }
     });
 
-    fetch('/api/whiteboard/load').then(r => r.json()).then(data => { if(data.state) masterCanvas.loadFromJSON(data.state, masterCanvas.renderAll.bind(masterCanvas)); });
+    fetch(MESA_BASE + '/api/whiteboard/load').then(r => r.json()).then(data => { if(data.state) masterCanvas.loadFromJSON(data.state, masterCanvas.renderAll.bind(masterCanvas)); });
+    updateWhiteboardHistory();
+    document.addEventListener('keydown', e => {
+        if (!(e.ctrlKey || e.metaKey) || document.activeElement.isContentEditable ||
+            ['INPUT', 'TEXTAREA'].includes(document.activeElement.tagName)) return;
+        if (e.key === 'z' && !e.shiftKey) { e.preventDefault(); undoWhiteboard(); }
+        else if (e.key === 'y' || (e.key === 'Z' && e.shiftKey)) { e.preventDefault(); redoWhiteboard(); }
+    });
     
     window.addEventListener('resize', () => {
         if(!document.getElementById('whiteboard-wrapper').classList.contains('wb-fullscreen') && masterCanvas){
@@ -291,7 +306,30 @@ function toggleGrid() {
 // No olvides añadirla a las exportaciones para que sea accesible desde el HTML
 window.toggleGrid = toggleGrid;
 function clearCanvas() { if(masterCanvas && confirm('¿Borrar todo?')) { masterCanvas.clear(); masterCanvas.backgroundColor='white'; saveWhiteboardState(); }}
-async function saveWhiteboardState() { if(masterCanvas) await fetchData('/api/whiteboard/save', 'POST', { state: JSON.stringify(masterCanvas.toJSON()) }); }
+async function saveWhiteboardState() {
+    if (!masterCanvas) return;
+    const r = await fetchData('/api/whiteboard/save', 'POST', { state: JSON.stringify(masterCanvas.toJSON()) });
+    if (r && r.version) updateWhiteboardHistory();
+}
+
+// ========== HISTORIAL DE LA PIZARRA ==========
+function applyWhiteboardVersion(r, msg) {
+    if (!r || !r.success) { updateStatus(r?.error || msg, true); return; }
+    if (r.state) masterCanvas.loadFromJSON(r.state, masterCanvas.renderAll.bind(masterCanvas));
+    else { masterCanvas.clear(); masterCanvas.backgroundColor = 'white'; }
+    updateStatus(`Pizarra: versión ${r.version}`);
+    updateWhiteboardHistory();
+}
+async function undoWhiteboard() { if (masterCanvas) applyWhiteboardVersion(await fetchData('/api/whiteboard/undo', 'POST'), 'Nada que deshacer'); }
+async function redoWhiteboard() { if (masterCanvas) applyWhiteboardVersion(await fetchData('/api/whiteboard/redo', 'POST'), 'Nada que rehacer'); }
+async function gotoWhiteboardVersion(v) { if (masterCanvas) applyWhiteboardVersion(await fetchData(`/api/whiteboard/history/${v}`, 'POST'), 'Versión no disponible'); }
+async function updateWhiteboardHistory() {
+    const h = await fetchData('/api/whiteboard/history');
+    const slider = document.getElementById('wbHistory');
+    if (!h || !slider || h.ultima === null) return;
+    slider.min = h.primera; slider.max = h.ultima; slider.value = h.actual;
+    slider.title = `Versión ${h.actual} de ${h.ultima} (${(h.bytes_disco / 1048576).toFixed(1)} MB en disco)`;
+}
 async function projectWhiteboard() { await saveWhiteboardState(); await saveScreenCommand('whiteboard'); updateStatus("Mostrando Pizarra"); }
 async function stopProjectingWhiteboard() { await saveScreenCommand('initiative'); updateStatus("Regresando"); }
 
@@ -304,7 +342,7 @@ function updateStatus(msg, err=false) {
 async function fetchData(url, method='GET', data=null) {
     const opts = { method: method, headers: { 'Content-Type': 'application/json' } };
     if (data) opts.body = JSON.stringify(data);
-    try { const r = await fetch(url, opts); return await r.json(); } catch (e) { console.error(e); return null; }
+    try { const r = await fetch(MESA_BASE + url, opts); return await r.json(); } catch (e) { console.error(e); return null; }
 }
 async function saveScreenCommand(type, data={}) { return fetchData('/api/screen/command', 'POST', { type, data }); }
 
@@ -406,7 +444,7 @@ async function showContentDetail(type, slug) {
     const c = document.getElementById('monsterDetailContent');
     if(c) c.innerHTML = '<div class="loading">Cargando...</div>'; 
     showModal();
-    const r = await fetch(`/content/${type}/${slug}`);
+    const r = await fetch(`${MESA_BASE}/content/${type}/${slug}`);
     if(c) c.innerHTML = await r.text();
     
     if (type === 'monster') currentContentData = grimoireMonsters.find(m => m.slug === slug);
@@ -432,6 +470,48 @@ async function projectCurrentCard() {
     updateStatus('Proyectado');
 }
 
+// ========== LISTA DE ESCENAS ==========
+// Las escenas encoladas se precargan en las pantallas; el icono dice cuántas
+// pantallas tienen ya descargada cada una.
+async function queueScene(type) {
+    let escena;
+    if (type === 'image') { if (!currentImage) return updateStatus('Sube una imagen primero', true); escena = { type, data: { url: currentImage } }; }
+    else if (type === 'video') { if (!currentVideo) return updateStatus('Sube un vídeo primero', true); escena = { type, data: { url: currentVideo } }; }
+    else if (type === 'youtube') { updateYoutubePreview(); if (!currentYouTubeId) return updateStatus('Pon una URL de YouTube', true); escena = { type, data: { video_id: currentYouTubeId, autoplay: true, muted: false } }; }
+    else escena = { type: 'initiative', data: {}, titulo: 'Iniciativa' };
+    const r = await fetchData('/api/scenes', 'POST', { escena });
+    if (r && r.success) { renderScenes(r); updateStatus('Escena en cola'); }
+    else updateStatus(r?.error || 'Error', true);
+}
+async function goToScene(indice, paso=1) {
+    const r = await fetchData('/api/scenes/go', 'POST', indice === null ? { paso } : { indice });
+    if (r && r.success) renderScenes(r); else updateStatus(r?.error || 'No hay más escenas', true);
+}
+async function deleteScene(indice) { const r = await fetchData(`/api/scenes/${indice}`, 'DELETE'); if (r && r.success) renderScenes(r); }
+async function loadScenes() { const r = await fetchData('/api/scenes'); if (r && r.success) renderScenes(r); }
+function renderScenes(r) {
+    const list = document.getElementById('sceneList');
+    if (!list) return;
+    // Con nodos y textContent: el título viene del usuario y no debe interpretarse como HTML
+    list.replaceChildren(...r.escenas.map((e, i) => {
+        const st = r.estado[i];
+        const fila = document.createElement('div');
+        fila.style.cssText = 'display:flex; gap:5px; align-items:center; padding:2px 4px;' + (i === r.actual ? ' background:#00bfa533;' : '');
+        const icono = document.createElement('span');
+        icono.textContent = st.fallidas.length ? '⚠️' : (st.lista ? '✅' : (st.pantallas ? '⏳' : '·'));
+        icono.title = `${st.listas}/${st.pantallas} pantallas`;
+        const nombre = document.createElement('span');
+        nombre.style.cssText = 'flex:1; overflow:hidden; white-space:nowrap; text-overflow:ellipsis;';
+        nombre.textContent = `${i + 1}. ${e.titulo.split('/').pop()}`;
+        const ir = document.createElement('button');
+        ir.textContent = '▶'; ir.onclick = () => goToScene(i);
+        const borrar = document.createElement('button');
+        borrar.textContent = '✖'; borrar.onclick = () => deleteScene(i);
+        fila.append(icono, nombre, ir, borrar);
+        return fila;
+    }));
+}
+
 // ========== MULTIMEDIA ==========
 function openFilePicker(t) { 
     const i = document.createElement('input'); i.type = 'file'; i.accept = t==='image'?'image/*':'video/*'; 
@@ -440,7 +520,7 @@ function openFilePicker(t) {
 async function uploadMedia(f, t) { 
     if(!f) return; 
     const fd = new FormData(); fd.append('file', f); 
-    const r = await(await fetch('/api/media/upload', {method:'POST', body:fd})).json(); 
+    const r = await(await fetch(MESA_BASE + '/api/media/upload', {method:'POST', body:fd})).json(); 
     if(r.success) { 
         if(t==='image') { currentImage = r.url; updateStatus('Imagen lista'); }
         else { currentVideo = r.url; updateStatus('Video listo'); }
@@ -473,7 +553,7 @@ function getMasterAudio() {
 async function loadAudioList() {
     try {
         console.log("Cargando lista de audios...");
-        const response = await fetch('/api/audio/list');
+        const response = await fetch(MESA_BASE + '/api/audio/list');
         const files = await response.json();
         const select = document.getElementById('audioList');
         
@@ -588,7 +668,7 @@ async function uploadAudio(file) {
     
     updateStatus('Subiendo audio...');
     try {
-        const r = await (await fetch('/api/media/upload?type=audio', { method:'POST', body:fd })).json(); 
+        const r = await (await fetch(MESA_BASE + '/api/media/upload?type=audio', { method:'POST', body:fd })).json(); 
         if(r.success) { 
             updateStatus('Audio subido con éxito');
             await loadAudioList(); // Esperamos a que recargue la lista